@@ -1,169 +1,389 @@
+import atexit
 import os
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, render_template, request, redirect, url_for, jsonify, g, has_app_context, Response, stream_template
 import sqlite3
-import os
+import base64
+import binascii
+import hmac
+import io
+import json
+import threading
+import time
 from datetime import datetime, date
-from decimal import Decimal
+
+import importer
+import migrations
+import money
+import recurring
+import rollups
+import search as fts
+import trends
+from category_index import CategorySuggestionIndex
+from db_pool import ConnectionPool
+from db_writer import DatabaseWriter
+from learning_queue import PatternLearningQueue
+import metrics
+from query_profiler import QueryProfiler
+from response_cache import ResponseCache
+from snapshot import DatabaseSnapshot
 
 app = Flask(__name__)
 
 # Database configuration
 DATABASE = 'budget_tracker.db'
 
+# Per-request SQL statement timing on the pool's and writer's connections
+# (QUERY_PROFILER=0 turns it off); statements slower than SLOW_QUERY_MS are
+# logged with their query plan
+query_profiler = (QueryProfiler(slow_ms=float(os.environ.get('SLOW_QUERY_MS', 100)))
+                  if os.environ.get('QUERY_PROFILER', '1') != '0' else None)
+
+# Per-route request counts and latency histograms for /metrics
+request_metrics = metrics.RequestMetrics()
+
+# Connection pool for reads (size can be tuned per deployment); the pooled
+# connections are query_only, every write goes through db_writer
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+db_pool = ConnectionPool(DATABASE, size=DB_POOL_SIZE, read_only=True, profiler=query_profiler)
+
+# Single writer connection with group commit: write routes submit a command
+# function and get its result back once it has committed
+db_writer = DatabaseWriter(DATABASE, max_batch=int(os.environ.get('DB_WRITER_BATCH', 64)),
+                           profiler=query_profiler)
+
+# Learned categorization patterns, kept in memory for the suggestions endpoint
+suggestion_index = CategorySuggestionIndex()
+
+# Pattern learning is written off the request path, batched by one writer thread
+learning_queue = PatternLearningQueue(db_writer.submit,
+                                      flush_interval_ms=int(os.environ.get('LEARNING_FLUSH_MS', 250)),
+                                      max_size=int(os.environ.get('LEARNING_QUEUE_SIZE', 10000)))
+
+# Rendered dashboard/analytics/API responses; write routes invalidate by data tag:
+# 'transactions', 'budgets', 'funds', 'categories'
+response_cache = ResponseCache(max_entries=int(os.environ.get('RESPONSE_CACHE_SIZE', 256)),
+                               ttl=int(os.environ.get('RESPONSE_CACHE_TTL', 300)))
+
+# Spend/budget history per category; closed months stay cached until a back-dated write
+trend_engine = trends.TrendEngine()
+
+def drop_snapshot_caches():
+    """Responses and closed trend months built from the previous snapshot"""
+    response_cache.invalidate('snapshot')
+    trend_engine.invalidate()
+
+# Optional read-only snapshot (backup API copy) that the analytics and debug
+# reads use instead of the live database: ANALYTICS_SNAPSHOT=memory, or a
+# file path for an on-disk copy. SNAPSHOT_MAX_AGE bounds its staleness in seconds.
+ANALYTICS_SNAPSHOT = os.environ.get('ANALYTICS_SNAPSHOT', '')
+analytics_snapshot = None
+if ANALYTICS_SNAPSHOT:
+    analytics_snapshot = DatabaseSnapshot(DATABASE,
+                                          max_age=float(os.environ.get('SNAPSHOT_MAX_AGE', 60)),
+                                          path=None if ANALYTICS_SNAPSHOT == 'memory' else ANALYTICS_SNAPSHOT,
+                                          profiler=query_profiler, on_refresh=drop_snapshot_caches)
+
+# (year, month) -> budget_periods.id for periods known to exist
+known_budget_periods = {}
+
+# sinking_funds.id -> sinking_funds.category_id, loaded on first use (funds
+# and their categories are only changed by migrations)
+fund_categories = {}
+
+# Days before a new month to roll its budget period over (0 = on first request)
+BUDGET_PERIOD_PRECREATE_DAYS = int(os.environ.get('BUDGET_PERIOD_PRECREATE_DAYS', 0))
+
+# Seconds between recurring transaction runs (0 = only when a rule is added)
+RECURRING_INTERVAL = int(os.environ.get('RECURRING_INTERVAL', 60 * 60))
+recurring_stats = {'runs': 0, 'written': 0, 'errors': 0}
+
 def get_db_connection():
-    import time
-    max_retries = 3
-    
-    for attempt in range(max_retries):
-        try:
-            conn = sqlite3.connect(DATABASE, timeout=30.0, check_same_thread=False)
-            conn.row_factory = sqlite3.Row
-            # Enable WAL mode for better concurrency
-            conn.execute('PRAGMA journal_mode=WAL;')
-            conn.execute('PRAGMA synchronous=NORMAL;')
-            conn.execute('PRAGMA cache_size=1000;')
-            conn.execute('PRAGMA temp_store=memory;')
-            return conn
-        except sqlite3.OperationalError as e:
-            if "database is locked" in str(e) and attempt < max_retries - 1:
-                time.sleep(0.1 * (attempt + 1))  # Short exponential backoff
-                continue
-            raise
-    raise sqlite3.OperationalError("Could not connect to database after retries")
+    """Get a pooled connection; inside a request the same one is reused until teardown"""
+    if has_app_context():
+        conn = g.get('db_conn')
+        if conn is None:
+            conn = db_pool.acquire()
+            conn.request_bound = True
+            g.db_conn = conn
+        return conn
+    return db_pool.acquire()
+
+def get_analytics_connection():
+    """Snapshot connection in snapshot mode (possibly up to SNAPSHOT_MAX_AGE old), else get_db_connection()"""
+    if analytics_snapshot is not None:
+        return analytics_snapshot.connection()
+    return get_db_connection()
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    """Check the request's connection back into the pool"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db_pool.release(conn)
+
+@app.route('/debug-db-pool')
+def debug_db_pool():
+    """Connection pool statistics (hits, waits, open count)"""
+    return jsonify(db_pool.get_stats())
+
+@app.route('/debug-learning-queue')
+def debug_learning_queue():
+    """Pattern learning queue statistics (depth, batches, enqueue-to-commit latency)"""
+    return jsonify(learning_queue.get_stats())
+
+@app.route('/debug-db-writer')
+def debug_db_writer():
+    """Writer statistics (queue depth, group commit batch sizes, wait and commit times)"""
+    return jsonify(db_writer.get_stats())
 
+@app.route('/debug-snapshot')
+def debug_snapshot():
+    """Analytics snapshot statistics (age, refreshes, copy time)"""
+    if analytics_snapshot is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(analytics_snapshot.get_stats(), enabled=True))
+
+@app.route('/debug-cache')
+def debug_cache():
+    """Response cache statistics (hits, misses, 304s, invalidations)"""
+    return jsonify(response_cache.get_stats())
+
+def route_label():
+    """The matched URL rule rather than the path, so ids and query strings don't multiply the series"""
+    return request.url_rule.rule if request.url_rule else '<unmatched>'
+
+@app.before_request
+def start_request_instrumentation():
+    g.request_started = time.perf_counter()
+    if query_profiler is not None:
+        query_profiler.start()
+
+@app.after_request
+def add_server_timing(response):
+    """Report the request's SQL time and statement count so far in a Server-Timing header"""
+    g.response_status = response.status_code
+    profile = query_profiler.current() if query_profiler is not None else None
+    if profile is not None:
+        response.headers['Server-Timing'] = query_profiler.server_timing(profile)
+    return response
+
+@app.teardown_request
+def finish_request_instrumentation(exception=None):
+    # Runs after a streamed body has been sent, so its time and statements are included
+    started = g.pop('request_started', None)
+    if started is not None:
+        status = 500 if exception is not None else g.get('response_status', 500)
+        request_metrics.observe(request.method, route_label(), status, time.perf_counter() - started)
+    if query_profiler is not None:
+        query_profiler.finish(f"{request.method} {route_label()}")
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Request, database, writer and cache metrics in Prometheus text format"""
+    lines = request_metrics.render()
+
+    pool = db_pool.get_stats()
+    writer = db_writer.get_stats()
+    lines += metrics.family('budget_db_connections_opened_total', 'counter', 'Database connections opened',
+                            [({'pool': 'read'}, pool['opened']), ({'pool': 'writer'}, writer['connections_opened'])])
+    lines += metrics.family('budget_db_connections_closed_total', 'counter', 'Database connections closed',
+                            [({'pool': 'read'}, pool['closed']), ({'pool': 'writer'}, writer['connections_closed'])])
+    lines += metrics.family('budget_db_pool_connections', 'gauge', 'Read pool connections by state',
+                            [({'state': 'in_use'}, pool['in_use']), ({'state': 'idle'}, pool['idle'])])
+    lines += metrics.family('budget_db_pool_checkouts_total', 'counter', 'Read connections checked out', pool['checkouts'])
+    # Waits/timeouts are get_db_connection blocking on the pool; writes don't retry on
+    # "database is locked" any more (one writer), so failed commits are the lock signal
+    lines += metrics.family('budget_db_pool_waits_total', 'counter', 'Checkouts that waited for a free connection', pool['waits'])
+    lines += metrics.family('budget_db_pool_timeouts_total', 'counter', 'Checkouts that gave up waiting', pool['timeouts'])
+
+    lines += metrics.family('budget_db_writer_commands_total', 'counter', 'Write commands run', writer['commands'])
+    lines += metrics.family('budget_db_writer_failed_commands_total', 'counter', 'Write commands that raised or were rolled back', writer['failed_commands'])
+    lines += metrics.family('budget_db_writer_commits_total', 'counter', 'Group commits', writer['commits'])
+    lines += metrics.family('budget_db_writer_commit_errors_total', 'counter', 'Group commits that failed (including busy/locked)', writer['commit_errors'])
+    lines += metrics.family('budget_db_writer_connect_errors_total', 'counter', 'Times the writer failed to open its connection', writer['connect_errors'])
+    lines += metrics.family('budget_db_writer_timeouts_total', 'counter', 'Writes whose submitter gave up waiting', writer['timed_out'])
+    lines += metrics.family('budget_db_writer_queue_depth', 'gauge', 'Write commands waiting for the writer', writer['depth'])
+    lines += metrics.family('budget_db_writer_wait_seconds_total', 'counter', 'Time commands spent queued', writer['total_wait_ms'] / 1000)
+    lines += metrics.family('budget_db_writer_commit_seconds_total', 'counter', 'Time spent in group commits', writer['total_commit_ms'] / 1000)
+
+    learning = learning_queue.get_stats()
+    lines += metrics.family('budget_recurring_runs_total', 'counter', 'Recurring transaction runs', recurring_stats['runs'])
+    lines += metrics.family('budget_recurring_transactions_written_total', 'counter', 'Transactions written from recurring rules', recurring_stats['written'])
+    lines += metrics.family('budget_recurring_errors_total', 'counter', 'Recurring transaction runs that failed', recurring_stats['errors'])
+
+    lines += metrics.family('budget_learning_queue_depth', 'gauge', 'Categorization patterns waiting to be written', learning['depth'])
+    lines += metrics.family('budget_learning_patterns_written_total', 'counter', 'Categorization patterns written', learning['written'])
+
+    cache = response_cache.get_stats()
+    lines += metrics.family('budget_response_cache_lookups_total', 'counter', 'Response cache lookups by result',
+                            [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])])
+    lines += metrics.family('budget_response_cache_not_modified_total', 'counter', 'Cached responses answered with 304', cache['not_modified'])
+    lines += metrics.family('budget_response_cache_entries', 'gauge', 'Responses held in the cache', cache['entries'])
+
+    if analytics_snapshot is not None:
+        snapshot = analytics_snapshot.get_stats()
+        lines += metrics.family('budget_snapshot_age_seconds', 'gauge', 'Seconds since the analytics snapshot was last known current',
+                                snapshot['age_seconds'] if snapshot['age_seconds'] is not None else float('nan'))
+        lines += metrics.family('budget_snapshot_refreshes_total', 'counter', 'Analytics snapshot copies taken', snapshot['refreshes'])
+        lines += metrics.family('budget_snapshot_refresh_seconds_total', 'counter', 'Time spent copying the analytics snapshot', snapshot['total_refresh_ms'] / 1000)
+
+    wal_path = DATABASE + '-wal'
+    lines += metrics.family('budget_db_wal_bytes', 'gauge', 'Size of the SQLite write-ahead log',
+                            os.path.getsize(wal_path) if os.path.exists(wal_path) else 0)
+    conn = get_db_connection()
+    rows = [({'table': table}, conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0])
+            for table in ('transactions', 'categorization_patterns')]
+    conn.close()
+    lines += metrics.family('budget_db_table_rows', 'gauge', 'Rows per table', rows)
+
+    return Response('\n'.join(lines) + '\n', content_type=metrics.CONTENT_TYPE)
+
+def is_admin_request():
+    """PROFILE_ADMIN_TOKEN via X-Admin-Token or ?token=; without one configured, local requests only"""
+    token = os.environ.get('PROFILE_ADMIN_TOKEN')
+    if token:
+        given = request.headers.get('X-Admin-Token') or request.args.get('token', '')
+        return hmac.compare_digest(given.encode(), token.encode())
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/debug/profile', methods=['GET', 'POST'])
+def debug_profile():
+    """Slowest routes and SQL statements since startup (POST resets the totals)"""
+    if not is_admin_request():
+        return "Forbidden", 403
+    if query_profiler is None:
+        return "Query profiler is disabled (QUERY_PROFILER=0)", 404
+    if request.method == 'POST':
+        query_profiler.reset()
+    routes = query_profiler.slowest_routes()
+    statements = query_profiler.slowest_statements()
+    if request.args.get('format') == 'json':
+        return jsonify({'slow_ms': query_profiler.slow_ms, 'routes': routes, 'statements': statements})
+    return render_template('debug_profile.html', slow_ms=query_profiler.slow_ms,
+                           routes=routes, statements=statements)
+
+
+def get_migration_connection():
+    """Own read-write connection for the migration runner, which manages its transactions itself"""
+    conn = sqlite3.connect(DATABASE, timeout=30.0)
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
 
 def init_db():
     """Initialize the database with tables and sample data"""
-    conn = get_db_connection()
-    
-    # Read and execute the schema
-    with open('schema.sql', 'r') as f:
-        conn.executescript(f.read())
-    
+    conn = get_migration_connection()
+    migrations.migrate(conn)
     conn.close()
 
 def init_db_if_needed():
-    """Initialize database if tables don't exist"""
-    conn = get_db_connection()
+    """Bring the database schema up to date (creates it on first run)"""
+    conn = get_migration_connection()
     
     try:
-        # Check if main tables exist
-        result = conn.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='categories'"
-        ).fetchone()
-        
-        if not result:
-            print("Database tables not found. Initializing database...")
-            # Tables don't exist, initialize database
-            with open('schema.sql', 'r') as f:
-                conn.executescript(f.read())
-            conn.commit()
-            print("Database initialized successfully!")
+        applied = migrations.migrate(conn)
+        if applied:
+            print(f"Applied {len(applied)} database migrations")
         else:
-            print("Database tables found. Skipping initialization.")
+            print("Database schema is up to date.")
     
     except Exception as e:
+        # Serving on a half-migrated schema fails later, on whichever route needs the
+        # missing step; stop startup here instead (gunicorn exits from on_starting)
         print(f"Error checking/initializing database: {e}")
+        raise
     finally:
         conn.close()
 
+def start_worker(shared_database=False):
+    """Per-process startup once the schema is current (dev server or each gunicorn worker)
+
+    shared_database: other server processes write to the same file, so watch
+    for their commits and drop this process's caches (see check_foreign_writes).
+    """
+    global data_version_conn
+    # Warm the category suggestion index before taking requests
+    conn = get_db_connection()
+    suggestion_index.load(conn)
+    conn.close()
+    
+    if shared_database:
+        data_version_conn = sqlite3.connect(DATABASE, check_same_thread=False)
+        check_foreign_writes()
+    
+    if BUDGET_PERIOD_PRECREATE_DAYS:
+        schedule_budget_period_precreation(BUDGET_PERIOD_PRECREATE_DAYS)
+    
+    if RECURRING_INTERVAL:
+        schedule_recurring_transactions(RECURRING_INTERVAL)
+    
+    if analytics_snapshot is not None:
+        analytics_snapshot.start()
+
+def shutdown():
+    """Flush queued pattern learning, then finish pending writes (also run by atexit)"""
+    if analytics_snapshot is not None:
+        analytics_snapshot.stop()
+    learning_queue.stop()
+    db_writer.stop()
+
+atexit.register(shutdown)
+
+# Multi-process serving: a connection used only to read PRAGMA data_version,
+# which changes whenever any other connection (another worker, or this
+# worker's db_writer) commits
+data_version_conn = None
+data_version_lock = threading.Lock()
+last_data_version = None
+
+@app.before_request
+def check_foreign_writes():
+    """Drop the response, trend and suggestion caches if the database changed since the last request
+
+    The write routes only invalidate their own process's caches, so with
+    several workers this is what keeps the others from serving stale pages.
+    It also fires on this worker's own writes, trading tag-level precision
+    for correctness.
+    """
+    global last_data_version
+    if data_version_conn is None:
+        return
+    with data_version_lock:
+        version = data_version_conn.execute('PRAGMA data_version').fetchone()[0]
+        changed = last_data_version is not None and version != last_data_version
+        last_data_version = version
+    if changed:
+        response_cache.invalidate('transactions', 'budgets', 'funds', 'categories')
+        trend_engine.invalidate()
+        # The next suggestion lookup reads the patterns written since (by other
+        # workers too) and the category names; the rest of the index stays
+        suggestion_index.invalidate()
+
 def learn_categorization_pattern(description, category_id):
     """Learn from user's categorization choice"""
     if not description or not category_id:
         return
     
     pattern = description.lower().strip()
-    conn = get_db_connection()
-    
-    # Check if pattern already exists
-    existing = conn.execute(
-        'SELECT id, usage_count FROM categorization_patterns WHERE description_pattern = ? AND category_id = ?',
-        (pattern, category_id)
-    ).fetchone()
-    
-    if existing:
-        # Increment usage count
-        conn.execute(
-            'UPDATE categorization_patterns SET usage_count = usage_count + 1, last_used = DATE("now") WHERE id = ?',
-            (existing['id'],)
-        )
-    else:
-        # Create new pattern
-        conn.execute(
-            'INSERT INTO categorization_patterns (description_pattern, category_id, last_used) VALUES (?, ?, DATE("now"))',
-            (pattern, category_id)
-        )
+    # The suggestion index learns right away; the database row is upserted by the queue's writer
+    learning_queue.put(pattern, category_id)
     
-    conn.commit()
-    conn.close()
+    if suggestion_index.loaded:
+        suggestion_index.learn(pattern, category_id)
 
 def get_category_suggestions(description):
     """Get category suggestions based on description"""
-    if not description or len(description.strip()) < 3:
-        return []
-    
-    pattern = description.lower().strip()
-    conn = get_db_connection()
-    
-    # Look for exact matches first
-    exact_matches = conn.execute('''
-        SELECT cp.category_id, c.name, cp.usage_count
-        FROM categorization_patterns cp
-        JOIN categories c ON cp.category_id = c.id
-        WHERE cp.description_pattern = ?
-        ORDER BY cp.usage_count DESC, cp.last_used DESC
-        LIMIT 3
-    ''', (pattern,)).fetchall()
-    
-    if exact_matches:
+    if not suggestion_index.loaded:
+        # Patterns still queued aren't in the table yet
+        learning_queue.flush()
+        conn = get_db_connection()
+        suggestion_index.load(conn)
         conn.close()
-        return [{'id': row['category_id'], 'name': row['name'], 'confidence': 'high'} for row in exact_matches]
-    
-    # Look for partial matches (words in common)
-    words = [word for word in pattern.split() if len(word) > 2]
-    suggestions = []
-    
-    if words:
-        # Find patterns that contain any of the words
-        word_conditions = ' OR '.join(['cp.description_pattern LIKE ?' for _ in words])
-        word_params = [f'%{word}%' for word in words]
-        
-        partial_matches = conn.execute(f'''
-            SELECT cp.category_id, c.name, cp.usage_count, cp.description_pattern
-            FROM categorization_patterns cp
-            JOIN categories c ON cp.category_id = c.id
-            WHERE {word_conditions}
-            ORDER BY cp.usage_count DESC, cp.last_used DESC
-            LIMIT 5
-        ''', word_params).fetchall()
-        
-        # Score matches based on word overlap
-        for match in partial_matches:
-            pattern_words = set(match['description_pattern'].split())
-            input_words = set(words)
-            overlap = len(pattern_words.intersection(input_words))
-            
-            if overlap > 0:
-                confidence = 'medium' if overlap >= 2 else 'low'
-                suggestions.append({
-                    'id': match['category_id'], 
-                    'name': match['name'], 
-                    'confidence': confidence
-                })
-    
-    conn.close()
-    
-    # Remove duplicates and return top 3
-    seen = set()
-    unique_suggestions = []
-    for suggestion in suggestions:
-        if suggestion['id'] not in seen:
-            seen.add(suggestion['id'])
-            unique_suggestions.append(suggestion)
-            if len(unique_suggestions) >= 3:
-                break
-    
-    return unique_suggestions
+    elif suggestion_index.stale:
+        # Only rows written since the last look; this worker's queued patterns are in the index already
+        conn = get_db_connection()
+        suggestion_index.refresh(conn)
+        conn.close()
+    return suggestion_index.suggest(description)
 
 @app.route('/api/category-suggestions')
 def category_suggestions():
@@ -175,239 +395,258 @@ def category_suggestions():
 # Add custom template filter for currency formatting
 @app.template_filter('currency')
 def currency_filter(amount):
-    """Format amount as currency"""
-    if amount is None:
-        amount = 0
-    return f"${float(amount):,.2f}"
+    """Format an amount in cents as currency"""
+    return money.format_currency(amount)
+
+@app.template_filter('dollars')
+def dollars_filter(amount):
+    """Amount in cents as a plain decimal, for form values and JavaScript"""
+    return money.format_dollars(amount)
+
+def get_month_bounds(year, month):
+    """Return (start, end) ISO dates for a month, used as start <= t.date < end"""
+    # Plain range bounds (instead of strftime() on every row) let SQLite use the date indexes
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+def roll_over_budget_period(conn, year, month):
+    """Create a month's budget period, copying last month's allocations; returns its id"""
+    prev_month = month - 1 if month > 1 else 12
+    prev_year = year if month > 1 else year - 1
+
+    # BEGIN IMMEDIATE takes the write lock up front (waiting on the busy timeout)
+    # so two processes rolling over at once can't both copy the allocations;
+    # on the db_writer connection this is already inside its group transaction
+    started = not conn.in_transaction
+    if started:
+        conn.execute('BEGIN IMMEDIATE')
+    try:
+        created = conn.execute(
+            'INSERT OR IGNORE INTO budget_periods (month, year) VALUES (?, ?)',
+            (month, year)
+        ).rowcount == 1
+        budget_period_id = conn.execute(
+            'SELECT id FROM budget_periods WHERE month = ? AND year = ?',
+            (month, year)
+        ).fetchone()['id']
+
+        prev_budget_period = conn.execute(
+            'SELECT id FROM budget_periods WHERE month = ? AND year = ?',
+            (prev_month, prev_year)
+        ).fetchone()
+
+        if created and prev_budget_period:
+            conn.execute('''
+                INSERT OR IGNORE INTO budget_allocations (budget_period_id, category_id, subcategory_id, budgeted_amount)
+                SELECT ?, category_id, subcategory_id, budgeted_amount
+                FROM budget_allocations WHERE budget_period_id = ?
+            ''', (budget_period_id, prev_budget_period['id']))
+            conn.execute(
+                'INSERT INTO month_transitions (from_month, from_year, to_month, to_year, transition_date) VALUES (?, ?, ?, ?, ?)',
+                (prev_month, prev_year, month, year, datetime.now().date())
+            )
+        if started:
+            conn.commit()
+    except Exception:
+        if started:
+            conn.rollback()
+        raise
+    return budget_period_id
+
+def get_fund_category_id(conn, fund_id):
+    """Category a sinking fund's transactions are filed under (None for an unknown fund)"""
+    global fund_categories
+    if fund_id not in fund_categories:
+        fund_categories = {row['id']: row['category_id'] for row in
+                           conn.execute('SELECT id, category_id FROM sinking_funds')}
+    return fund_categories.get(fund_id)
 
 def ensure_current_budget_period():
     """Ensure current month budget period exists, create if needed"""
-    import time
-    max_retries = 3
-    
     now = datetime.now()
-    current_month = now.month
-    current_year = now.year
-    
-    for attempt in range(max_retries):
+    key = (now.year, now.month)
+    # Periods are never deleted, so once seen the id is good for the life of the process
+    budget_period_id = known_budget_periods.get(key)
+    if budget_period_id is not None:
+        return budget_period_id
+
+    conn = get_db_connection()
+    try:
+        budget_period = conn.execute(
+            'SELECT id FROM budget_periods WHERE month = ? AND year = ?',
+            (now.month, now.year)
+        ).fetchone()
+        if budget_period:
+            budget_period_id = budget_period['id']
+        else:
+            budget_period_id = db_writer.submit(roll_over_budget_period, now.year, now.month)
+            response_cache.invalidate('budgets')
+    finally:
+        conn.close()
+
+    known_budget_periods[key] = budget_period_id
+    return budget_period_id
+
+def precreate_next_budget_period(days_ahead):
+    """Roll next month over early when it starts within days_ahead days
+
+    Allocations are copied as they stand now, so budget edits made after this
+    runs only apply to the current month.
+    """
+    today = datetime.now().date()
+    next_start = date(today.year + 1, 1, 1) if today.month == 12 else date(today.year, today.month + 1, 1)
+    if (next_start - today).days > days_ahead:
+        return None
+    return db_writer.submit(roll_over_budget_period, next_start.year, next_start.month)
+
+def run_recurring_transactions(today=None):
+    """Write all due recurring transactions in one writer command; returns how many"""
+    created = db_writer.submit(recurring.materialize_due, today)
+    recurring_stats['runs'] += 1
+    recurring_stats['written'] += len(created)
+    if created:
+        response_cache.invalidate('transactions', 'funds')
+        for month in {row[0][:7] for row in created}:
+            trend_engine.invalidate(f"{month}-01")
+    return len(created)
+
+def schedule_recurring_transactions(interval):
+    """Catch up on due recurring transactions now, then every `interval` seconds on a daemon timer
+
+    Every gunicorn worker runs this; recurring_occurrences keeps them from
+    writing an occurrence twice.
+    """
+    def run():
         try:
-            conn = get_db_connection()
-            
-            # Check if current budget period exists
-            budget_period = conn.execute(
-                'SELECT id FROM budget_periods WHERE month = ? AND year = ?',
-                (current_month, current_year)
-            ).fetchone()
-            
-            if not budget_period:
-                # Use INSERT OR IGNORE to handle race conditions
-                conn.execute(
-                    'INSERT OR IGNORE INTO budget_periods (month, year) VALUES (?, ?)',
-                    (current_month, current_year)
-                )
-                conn.commit()
-                
-                # Get the budget period ID
-                budget_period = conn.execute(
-                    'SELECT id FROM budget_periods WHERE month = ? AND year = ?',
-                    (current_month, current_year)
-                ).fetchone()
-                budget_period_id = budget_period['id']
-                
-                # Copy budget allocations from previous month (with error handling)
-                try:
-                    prev_month = current_month - 1 if current_month > 1 else 12
-                    prev_year = current_year if current_month > 1 else current_year - 1
-                    
-                    prev_budget_period = conn.execute(
-                        'SELECT id FROM budget_periods WHERE month = ? AND year = ?',
-                        (prev_month, prev_year)
-                    ).fetchone()
-                    
-                    if prev_budget_period:
-                        prev_allocations = conn.execute(
-                            'SELECT category_id, subcategory_id, budgeted_amount FROM budget_allocations WHERE budget_period_id = ?',
-                            (prev_budget_period['id'],)
-                        ).fetchall()
-                        
-                        for allocation in prev_allocations:
-                            conn.execute(
-                                'INSERT OR IGNORE INTO budget_allocations (budget_period_id, category_id, subcategory_id, budgeted_amount) VALUES (?, ?, ?, ?)',
-                                (budget_period_id, allocation['category_id'], allocation['subcategory_id'], allocation['budgeted_amount'])
-                            )
-                        
-                        # Record the transition
-                        conn.execute(
-                            'INSERT OR IGNORE INTO month_transitions (from_month, from_year, to_month, to_year, transition_date) VALUES (?, ?, ?, ?, ?)',
-                            (prev_month, prev_year, current_month, current_year, now.date())
-                        )
-                except Exception as e:
-                    print(f"Warning: Could not copy previous month's budget: {e}")
-                
-                conn.commit()
-            else:
-                budget_period_id = budget_period['id']
-            
-            conn.close()
-            return budget_period_id
-            
-        except sqlite3.OperationalError as e:
-            if "database is locked" in str(e) and attempt < max_retries - 1:
-                time.sleep(0.2 * (attempt + 1))
-                continue
-            else:
-                print(f"Database error in ensure_current_budget_period: {e}")
-                raise
+            run_recurring_transactions()
         except Exception as e:
-            print(f"Unexpected error in ensure_current_budget_period: {e}")
-            raise
-    
-    raise sqlite3.OperationalError("Could not access database after retries")
+            # Anything raised here would escape post_worker_init, or end the timer chain
+            recurring_stats['errors'] += 1
+            print(f"Could not write recurring transactions: {e}")
+        finally:
+            timer = threading.Timer(interval, run)
+            timer.daemon = True
+            timer.start()
+    run()
 
-# Fixed Analytics Route for Budget Tracker Pro
-# This solves the data type mismatch issue in budget vs actual chart
+def schedule_budget_period_precreation(days_ahead, interval=6 * 60 * 60):
+    """Check for an upcoming month on a daemon timer every `interval` seconds"""
+    def run():
+        try:
+            precreate_next_budget_period(days_ahead)
+        except sqlite3.Error as e:
+            print(f"Could not pre-create next month's budget period: {e}")
+        timer = threading.Timer(interval, run)
+        timer.daemon = True
+        timer.start()
+    run()
 
 @app.route('/analytics')
 def analytics():
-    try:
-        from datetime import datetime
-        conn = get_db_connection()
-        now = datetime.now()
-        current_month = now.month
-        current_year = now.year
+    """Analytics page shell; each chart fetches its data from /api/analytics/*"""
+    return render_template('analytics.html', current_month_name=datetime.now().strftime('%B %Y'))
 
-        # --- Category Spending Breakdown (already works) ---
-        category_spending = conn.execute('''
-            SELECT 
-                c.name AS category,
-                SUM(t.amount) AS total_spent
-            FROM transactions t
-            JOIN categories c ON t.category_id = c.id
-            WHERE strftime('%m', t.date) = ? 
-              AND strftime('%Y', t.date) = ?
-              AND t.sinking_fund_id IS NULL
-            GROUP BY c.id, c.name
-            ORDER BY total_spent DESC
-        ''', (f'{current_month:02d}', str(current_year))).fetchall()
-
-        # --- Budget vs Actual Calculation ---
-        budget_vs_actual = []
-
-        # Get current budget period
-        budget_period = conn.execute('''
-            SELECT id FROM budget_periods 
-            WHERE month = ? AND year = ?
-        ''', (current_month, current_year)).fetchone()
-
-        if budget_period:
-            budget_period_id = budget_period['id']
-
-            # 1. Fetch budgeted allocations
-            budget_allocations = conn.execute('''
-                SELECT c.name AS category, ba.budgeted_amount
-                FROM budget_allocations ba
-                JOIN categories c ON ba.category_id = c.id
-                WHERE ba.budget_period_id = ?
-            ''', (budget_period_id,)).fetchall()
-
-            # 2. Fetch actual spending
-            spending_data = conn.execute('''
-                SELECT c.name AS category, SUM(t.amount) AS spent
-                FROM transactions t
-                JOIN categories c ON t.category_id = c.id
-                WHERE strftime('%m', t.date) = ? 
-                  AND strftime('%Y', t.date) = ?
-                  AND t.sinking_fund_id IS NULL
-                GROUP BY c.name
-            ''', (f'{current_month:02d}', str(current_year))).fetchall()
-
-            # 3. Convert spending to lookup dictionary
-            category_spending_dict = {
-                row['category']: float(row['spent']) if row['spent'] else 0.0
-                for row in spending_data
-            }
-
-            # 4. Combine budgeted and spent data
-            for allocation in budget_allocations:
-                try:
-                    category_name = allocation['category']
-                    budgeted = allocation['budgeted_amount']
-                    if budgeted is None:
-                        continue
-
-                    # Force cast to float
-                    budgeted_float = float(budgeted)
-                    if budgeted_float <= 0:
-                        continue
-
-                    spent_float = category_spending_dict.get(category_name, 0.0)
-
-                    budget_vs_actual.append({
-                        'category': category_name,
-                        'budgeted': budgeted_float,
-                        'spent': spent_float
-                    })
-
-                except (ValueError, TypeError) as e:
-                    print(f"Skipping invalid budget data: {allocation} -> {e}")
-                    continue
-
-        # --- Sinking Fund Progress ---
-        raw_sinking_funds = conn.execute('''
-            SELECT 
-                sf.name,
-                sf.current_balance,
-                sf.target_amount,
-                sf.monthly_allocation
-            FROM sinking_funds sf
-            WHERE sf.is_active = 1
-            ORDER BY sf.name
-        ''').fetchall()
-
-        processed_sinking_funds = []
-        for fund in raw_sinking_funds:
-            try:
-                current_balance = float(fund['current_balance'] or 0)
-                target_amount = float(fund['target_amount'] or 0)
-                monthly_allocation = float(fund['monthly_allocation'] or 0)
-
-                progress_percent = (
-                    round((current_balance / target_amount) * 100.0, 1)
-                    if target_amount > 0 else 0.0
-                )
-
-                processed_sinking_funds.append({
-                    'name': fund['name'],
-                    'current_balance': current_balance,
-                    'target_amount': target_amount,
-                    'monthly_allocation': monthly_allocation,
-                    'progress_percent': progress_percent
-                })
-            except (ValueError, TypeError) as e:
-                print(f"Skipping invalid sinking fund data: {fund} -> {e}")
-                continue
+@app.route('/api/analytics/category-spending')
+@response_cache.cached_view('transactions', 'categories', 'snapshot')
+def analytics_category_spending():
+    """This month's spending per category, largest first (columnar JSON)"""
+    now = datetime.now()
+    conn = get_analytics_connection()
+    rows = conn.execute('''
+        SELECT c.name AS category, mct.spent AS total_spent
+        FROM monthly_category_totals mct
+        JOIN categories c ON mct.category_id = c.id
+        WHERE mct.year = ? AND mct.month = ?
+          AND mct.expense_count > 0
+        ORDER BY total_spent DESC
+    ''', (now.year, now.month)).fetchall()
+    conn.close()
+    
+    return jsonify({
+        'categories': [row['category'] for row in rows],
+        'spent': [money.from_cents(row['total_spent']) for row in rows],
+    })
 
-        conn.close()
+@app.route('/api/analytics/budget-vs-actual')
+@response_cache.cached_view('transactions', 'budgets', 'categories', 'snapshot')
+def analytics_budget_vs_actual():
+    """This month's budgeted vs spent for every category with a budget (columnar JSON)"""
+    now = datetime.now()
+    conn = get_analytics_connection()
+    # Allocations are summed per category first so subcategory rows don't repeat the spend
+    rows = conn.execute('''
+        SELECT c.name AS category, b.budgeted,
+               CASE WHEN mct.expense_count > 0 THEN mct.spent ELSE 0 END AS spent
+        FROM (
+            SELECT ba.category_id, SUM(ba.budgeted_amount) AS budgeted
+            FROM budget_allocations ba
+            JOIN budget_periods bp ON bp.id = ba.budget_period_id
+            WHERE bp.year = ? AND bp.month = ?
+            GROUP BY ba.category_id
+            HAVING budgeted > 0
+        ) b
+        JOIN categories c ON c.id = b.category_id
+        LEFT JOIN monthly_category_totals mct ON mct.category_id = b.category_id
+            AND mct.year = ? AND mct.month = ?
+        ORDER BY c.name
+    ''', (now.year, now.month, now.year, now.month)).fetchall()
+    conn.close()
+    
+    return jsonify({
+        'categories': [row['category'] for row in rows],
+        'budgeted': [money.from_cents(row['budgeted']) for row in rows],
+        'spent': [money.from_cents(row['spent']) for row in rows],
+    })
 
-        return render_template('analytics.html',
-            category_spending=category_spending,
-            budget_vs_actual=budget_vs_actual,
-            monthly_trends=[],  # Future enhancement
-            sinking_fund_progress=processed_sinking_funds,
-            current_month_name=now.strftime('%B %Y')
-        )
+@app.route('/api/analytics/sinking-funds')
+@response_cache.cached_view('funds', 'snapshot')
+def analytics_sinking_funds():
+    """Balance, target and progress of each active sinking fund (columnar JSON)"""
+    conn = get_analytics_connection()
+    funds = conn.execute('''
+        SELECT name,
+               COALESCE(current_balance, 0) AS current_balance,
+               COALESCE(target_amount, 0) AS target_amount,
+               COALESCE(monthly_allocation, 0) AS monthly_allocation
+        FROM sinking_funds
+        WHERE is_active = 1
+        ORDER BY name
+    ''').fetchall()
+    conn.close()
+    
+    return jsonify({
+        'names': [fund['name'] for fund in funds],
+        'current_balance': [money.from_cents(fund['current_balance']) for fund in funds],
+        'target_amount': [money.from_cents(fund['target_amount']) for fund in funds],
+        'monthly_allocation': [money.from_cents(fund['monthly_allocation']) for fund in funds],
+        'progress_percent': [
+            round(fund['current_balance'] / fund['target_amount'] * 100.0, 1) if fund['target_amount'] > 0 else 0.0
+            for fund in funds
+        ],
+    })
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return f"Analytics Error: {str(e)}"
+@app.route('/api/analytics/trends')
+@response_cache.cached_view('transactions', 'budgets', 'categories', 'snapshot')
+def analytics_trends():
+    """Spend, budget and variance per category over the last N months (columnar JSON)"""
+    months = request.args.get('months', trends.DEFAULT_MONTHS, type=int)
+    window = request.args.get('window', trends.DEFAULT_WINDOW, type=int)
+    if not 1 <= months <= trends.MAX_MONTHS or not 1 <= window <= months:
+        return jsonify({'error': f'months must be 1-{trends.MAX_MONTHS} and window 1-months'}), 400
+    
+    conn = get_analytics_connection()
+    data = trend_engine.build(conn, months, window)
+    conn.close()
+    
+    return jsonify(data)
 
         
 @app.route('/debug-budget-data')
 def debug_budget_data():
     """Temporary debug route to inspect budget data types"""
     try:
-        conn = get_db()
+        conn = get_analytics_connection()
         
         # Get sample budget allocation data with type information
         debug_cursor = conn.execute('''
@@ -457,10 +696,10 @@ def debug_detailed():
     current_date = datetime.now()
     current_month = current_date.month
     current_year = current_date.year
+    month_start, month_end = get_month_bounds(current_year, current_month)
     
     try:
-        conn = sqlite3.connect('budget_tracker.db', timeout=30)
-        conn.execute('PRAGMA journal_mode=WAL')
+        conn = get_analytics_connection()
         
         debug_info = []
         debug_info.append(f"<h2>Debugging Budget vs Actual for {current_month}/{current_year}</h2>")
@@ -481,7 +720,7 @@ def debug_detailed():
             # Check what periods DO exist
             all_periods_cursor = conn.execute('SELECT id, month, year FROM budget_periods ORDER BY year DESC, month DESC LIMIT 5')
             all_periods = all_periods_cursor.fetchall()
-            debug_info.append(f"Available periods: {all_periods}")
+            debug_info.append(f"Available periods: {[tuple(p) for p in all_periods]}")
             
         # 2. Check budget_allocations for current period
         debug_info.append("<h3>2. Budget Allocations Check:</h3>")
@@ -497,7 +736,7 @@ def debug_detailed():
             if allocations:
                 debug_info.append(f"✓ Found {len(allocations)} budget allocations:")
                 for alloc in allocations:
-                    debug_info.append(f"  - {alloc[1]}: {alloc[2]} (type: {alloc[3]})")
+                    debug_info.append(f"  - {alloc[1]}: {money.format_currency(alloc[2])} (type: {alloc[3]})")
             else:
                 debug_info.append("✗ No budget allocations found for this period")
         
@@ -507,15 +746,15 @@ def debug_detailed():
             SELECT t.id, t.description, t.amount, c.name, t.date
             FROM transactions t
             JOIN categories c ON t.category_id = c.id
-            WHERE strftime('%m', t.date) = ? AND strftime('%Y', t.date) = ?
+            WHERE t.date >= ? AND t.date < ?
             LIMIT 10
-        ''', (str(current_month).zfill(2), str(current_year)))
+        ''', (month_start, month_end))
         transactions = trans_cursor.fetchall()
         
         if transactions:
             debug_info.append(f"✓ Found {len(transactions)} transactions this month:")
             for trans in transactions[:5]:  # Show first 5
-                debug_info.append(f"  - {trans[1]}: ${trans[2]} ({trans[3]}) on {trans[4]}")
+                debug_info.append(f"  - {trans[1]}: {money.format_currency(trans[2])} ({trans[3]}) on {trans[4]}")
         else:
             debug_info.append("✗ No transactions found for current month")
             
@@ -531,18 +770,17 @@ def debug_detailed():
                 JOIN categories c ON ba.category_id = c.id
                 JOIN budget_periods bp ON ba.budget_period_id = bp.id
                 LEFT JOIN transactions t ON t.category_id = ba.category_id 
-                    AND strftime('%m', t.date) = printf('%02d', bp.month)
-                    AND strftime('%Y', t.date) = CAST(bp.year AS TEXT)
+                    AND t.date >= ? AND t.date < ?
                 WHERE bp.month = ? AND bp.year = ?
                 GROUP BY c.name, ba.budgeted_amount
-            ''', (current_month, current_year))
+            ''', (month_start, month_end, current_month, current_year))
             
             analytics_results = analytics_cursor.fetchall()
             
             if analytics_results:
                 debug_info.append(f"✓ Analytics query returned {len(analytics_results)} results:")
                 for result in analytics_results:
-                    debug_info.append(f"  - {result[0]}: Budget ${result[1]}, Spent ${result[2]}")
+                    debug_info.append(f"  - {result[0]}: Budget {money.format_currency(result[1])}, Spent {money.format_currency(result[2])}")
             else:
                 debug_info.append("✗ Analytics query returned no results")
                 
@@ -572,45 +810,7 @@ def debug_detailed():
     except Exception as e:
         return f"Debug error: {str(e)}"
 
-# ALTERNATIVE APPROACH: Fix the database data types
-def fix_budget_data_types():
-    """One-time function to fix budget amount data types in database"""
-    conn = get_db()
-    
-    try:
-        # Get all budget allocations
-        cursor = conn.execute('SELECT id, budgeted_amount FROM budget_allocations')
-        allocations = cursor.fetchall()
-        
-        # Update each record to ensure proper numeric storage
-        for allocation_id, amount in allocations:
-            try:
-                # Convert to float and back to ensure numeric storage
-                if isinstance(amount, str):
-                    numeric_amount = float(amount.replace('$', '').replace(',', '').strip())
-                else:
-                    numeric_amount = float(amount)
-                
-                # Update the record with proper numeric value
-                conn.execute(
-                    'UPDATE budget_allocations SET budgeted_amount = ? WHERE id = ?',
-                    (numeric_amount, allocation_id)
-                )
-                
-            except (ValueError, TypeError):
-                print(f"Could not convert amount for allocation {allocation_id}: {amount}")
-        
-        conn.commit()
-        conn.close()
-        print("Budget data types fixed successfully!")
-        
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        print(f"Error fixing budget data types: {str(e)}")
-
-# Call this function once to fix existing data:
-# fix_budget_data_types()@app.route('/debug-routes')
+@app.route('/debug-routes')
 def debug_routes():
     routes = []
     for rule in app.url_map.iter_rules():
@@ -618,6 +818,7 @@ def debug_routes():
     return "<br>".join(routes)
 
 @app.route('/')
+@response_cache.cached_view('transactions', 'budgets', 'funds', 'categories')
 def index():
     """Main dashboard"""
     # Ensure current budget period exists
@@ -635,15 +836,13 @@ def index():
         SELECT 
             c.name as category_name,
             COALESCE(ba.budgeted_amount, 0) as budgeted,
-            COALESCE(SUM(CASE WHEN t.sinking_fund_id IS NULL THEN t.amount ELSE 0 END), 0) as spent
+            COALESCE(mct.spent, 0) as spent
         FROM categories c
         LEFT JOIN budget_allocations ba ON c.id = ba.category_id AND ba.budget_period_id = ?
-        LEFT JOIN transactions t ON c.id = t.category_id 
-            AND strftime('%m', t.date) = ? 
-            AND strftime('%Y', t.date) = ?
-        GROUP BY c.id, c.name, ba.budgeted_amount
+        LEFT JOIN monthly_category_totals mct ON c.id = mct.category_id
+            AND mct.year = ? AND mct.month = ?
         ORDER BY c.name
-    ''', (budget_period_id, f'{current_month:02d}', str(current_year))).fetchall()
+    ''', (budget_period_id, current_year, current_month)).fetchall()
     
     # Get recent transactions (excluding sinking fund transactions for budget tab)
     recent_transactions = conn.execute('''
@@ -658,28 +857,12 @@ def index():
         LIMIT 10
     ''').fetchall()
     
-    # Get sinking funds data
+    # Get sinking funds data (current_balance is maintained by the write routes;
+    # `python rollups.py reconcile-funds` repairs any drift from the ledger)
     sinking_funds = conn.execute('''
-        SELECT 
-            sf.*,
-            COALESCE(SUM(CASE WHEN t.transaction_type = 'contribution' THEN t.amount ELSE 0 END), 0) -
-            COALESCE(SUM(CASE WHEN t.transaction_type = 'withdrawal' THEN t.amount ELSE 0 END), 0) as calculated_balance
-        FROM sinking_funds sf
-        LEFT JOIN transactions t ON sf.id = t.sinking_fund_id
-        WHERE sf.is_active = 1
-        GROUP BY sf.id, sf.name, sf.target_amount, sf.current_balance, sf.monthly_allocation
-        ORDER BY sf.name
+        SELECT * FROM sinking_funds WHERE is_active = 1 ORDER BY name
     ''').fetchall()
     
-    # Update current balances based on transactions
-    for fund in sinking_funds:
-        if fund['calculated_balance'] != fund['current_balance']:
-            conn.execute(
-                'UPDATE sinking_funds SET current_balance = ? WHERE id = ?',
-                (fund['calculated_balance'], fund['id'])
-            )
-    conn.commit()
-    
     # Check if monthly sinking fund contributions have been made this month
     monthly_contributions_made = conn.execute('''
         SELECT COUNT(*) as count FROM month_transitions 
@@ -700,62 +883,30 @@ def index():
 @app.route('/contribute-monthly-allocations', methods=['POST'])
 def contribute_monthly_allocations():
     """Auto-contribute monthly allocations to all sinking funds"""
-    try:
-        conn = get_db_connection()
-        now = datetime.now()
-        current_month = now.month
-        current_year = now.year
-        
-        # Check if already contributed this month
+    now = datetime.now()
+    current_month = now.month
+    current_year = now.year
+    
+    def contribute(conn):
+        # Check if already contributed this month (inside the write, so two clicks can't both pass)
         existing = conn.execute('''
             SELECT COUNT(*) as count FROM month_transitions 
             WHERE to_month = ? AND to_year = ? AND sinking_funds_contributed = 1
         ''', (current_month, current_year)).fetchone()
         
         if existing['count'] > 0:
-            conn.close()
-            return "Monthly contributions already made", 400
+            return False
         
-        # Get all active sinking funds with monthly allocations
-        sinking_funds = conn.execute('''
-            SELECT * FROM sinking_funds 
+        # One contribution per active fund with a monthly allocation, filed under the fund's category
+        today = now.date().isoformat()
+        conn.execute('''
+            INSERT INTO transactions (date, description, amount, category_id, sinking_fund_id, transaction_type)
+            SELECT ?, 'Monthly allocation to ' || name, monthly_allocation, category_id, id, 'contribution'
+            FROM sinking_funds
             WHERE is_active = 1 AND monthly_allocation > 0
             ORDER BY name
-        ''').fetchall()
-        
-        total_contributed = 0
-        contributions_made = 0
-        
-        for fund in sinking_funds:
-            if fund['monthly_allocation'] > 0:
-                # Map sinking funds to their appropriate categories
-                category_mapping = {
-                    1: 11,  # Wife/Household -> Wife Support  
-                    2: 2,   # Vehicle -> Car Expenses
-                    3: 5,   # Emergency Fund -> Emergency Fund Build-Up
-                    4: 3,   # Discretionary -> Prof. Dues + Prime
-                    5: 4    # Assembly/Convention -> Convention & Assembly
-                }
-                
-                category_id = category_mapping.get(fund['id'], 5)
-                
-                # Create transaction for the contribution
-                description = f"Monthly allocation to {fund['name']}"
-                
-                conn.execute('''
-                    INSERT INTO transactions (date, description, amount, category_id, sinking_fund_id, transaction_type)
-                    VALUES (?, ?, ?, ?, ?, 'contribution')
-                ''', (now.date(), description, fund['monthly_allocation'], category_id, fund['id']))
-                
-                # Update sinking fund balance
-                new_balance = fund['current_balance'] + fund['monthly_allocation']
-                conn.execute(
-                    'UPDATE sinking_funds SET current_balance = ? WHERE id = ?',
-                    (new_balance, fund['id'])
-                )
-                
-                total_contributed += fund['monthly_allocation']
-                contributions_made += 1
+        ''', (today,))
+        rollups.apply_monthly_contributions(conn, today)
         
         # Mark contributions as made for this month
         cursor = conn.execute('''
@@ -772,9 +923,12 @@ def contribute_monthly_allocations():
             ''', (current_month-1 if current_month > 1 else 12, 
                   current_year if current_month > 1 else current_year-1,
                   current_month, current_year, now.date()))
-        
-        conn.commit()
-        conn.close()
+        return True
+    
+    try:
+        if not db_writer.submit(contribute):
+            return "Monthly contributions already made", 400
+        response_cache.invalidate('transactions', 'funds')
         
         return redirect(url_for('index'))
         
@@ -782,67 +936,159 @@ def contribute_monthly_allocations():
         return f"Error contributing to sinking funds: {str(e)}", 400
 
 @app.route('/api/sinking-funds')
+@response_cache.cached_view('funds')
 def get_sinking_funds():
     """Get all sinking funds (AJAX endpoint)"""
     conn = get_db_connection()
     sinking_funds = conn.execute('SELECT * FROM sinking_funds WHERE is_active = 1 ORDER BY name').fetchall()
     conn.close()
     
-    return jsonify([dict(row) for row in sinking_funds])
+    funds = []
+    for row in sinking_funds:
+        fund = dict(row)
+        for column in money.MONEY_COLUMNS['sinking_funds']:
+            fund[column] = money.from_cents(fund[column])
+        funds.append(fund)
+    
+    return jsonify(funds)
+
+@app.route('/api/recurring-transactions')
+def get_recurring_transactions():
+    """Active recurring transaction rules (AJAX endpoint)"""
+    conn = get_db_connection()
+    rules = conn.execute('''
+        SELECT r.*, c.name AS category_name
+        FROM recurring_transactions r
+        JOIN categories c ON r.category_id = c.id
+        WHERE r.is_active = 1
+        ORDER BY r.next_due, r.description
+    ''').fetchall()
+    conn.close()
+    
+    result = []
+    for row in rules:
+        rule = dict(row)
+        rule['amount'] = money.from_cents(rule['amount'])
+        result.append(rule)
+    return jsonify(result)
+
+@app.route('/api/recurring-transactions', methods=['POST'])
+def add_recurring_transaction():
+    """Add a recurring transaction rule; occurrences already due are written right away"""
+    try:
+        description = request.form.get('description', '').strip()
+        if not description:
+            return jsonify({'error': 'Description is required'}), 400
+        frequency = request.form.get('frequency', 'monthly')
+        if frequency not in recurring.FREQUENCIES:
+            return jsonify({'error': f"Frequency must be one of {', '.join(recurring.FREQUENCIES)}"}), 400
+        amount = money.to_cents(request.form['amount'])
+        category_id = int(request.form['category_id'])
+        interval_count = int(request.form.get('interval_count') or 1)
+        if interval_count < 1:
+            return jsonify({'error': 'interval_count must be at least 1'}), 400
+        start_date = date.fromisoformat(request.form.get('start_date') or datetime.now().date().isoformat())
+        end_date = request.form.get('end_date') or None
+        if end_date:
+            end_date = date.fromisoformat(end_date)
+            if end_date < start_date:
+                return jsonify({'error': 'end_date must not be before start_date'}), 400
+            end_date = end_date.isoformat()
+        subcategory_id = request.form.get('subcategory_id')
+        subcategory_id = int(subcategory_id) if subcategory_id else None
+        sinking_fund_id = request.form.get('sinking_fund_id')
+        sinking_fund_id = int(sinking_fund_id) if sinking_fund_id else None
+        transaction_type = request.form.get('transaction_type') or ('contribution' if sinking_fund_id else 'expense')
+        # Withdrawals are left out: an occurrence is written unattended, with no
+        # one to stop it when the fund's balance no longer covers it
+        if transaction_type not in ('expense', 'contribution'):
+            return jsonify({'error': 'transaction_type must be expense or contribution'}), 400
+        if (transaction_type == 'contribution') != (sinking_fund_id is not None):
+            return jsonify({'error': 'A sinking_fund_id is required for contributions, and only for them'}), 400
+        
+        def add(conn):
+            # The references are checked in the same transaction as the insert
+            if not conn.execute('SELECT 1 FROM categories WHERE id = ?', (category_id,)).fetchone():
+                return "Category not found", 400
+            if subcategory_id is not None and not conn.execute(
+                    'SELECT 1 FROM subcategories WHERE id = ? AND category_id = ?',
+                    (subcategory_id, category_id)).fetchone():
+                return "Subcategory not found in this category", 400
+            if sinking_fund_id is not None and not conn.execute(
+                    'SELECT 1 FROM sinking_funds WHERE id = ? AND is_active = 1', (sinking_fund_id,)).fetchone():
+                return "Sinking fund not found", 400
+            
+            return conn.execute('''
+                INSERT INTO recurring_transactions
+                    (description, amount, category_id, subcategory_id, sinking_fund_id, transaction_type,
+                     frequency, interval_count, start_date, next_due, end_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (description, amount, category_id, subcategory_id, sinking_fund_id, transaction_type,
+                  frequency, interval_count, start_date.isoformat(), start_date.isoformat(), end_date)).lastrowid
+        
+        rule_id = db_writer.submit(add)
+        if isinstance(rule_id, tuple):
+            message, status = rule_id
+            return jsonify({'error': message}), status
+        written = run_recurring_transactions()
+        return jsonify({'id': rule_id, 'written': written, 'message': 'Recurring transaction added successfully'})
+        
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f"Invalid recurring transaction: {e}"}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/recurring-transactions/<int:rule_id>', methods=['DELETE'])
+def delete_recurring_transaction(rule_id):
+    """Stop a recurring transaction; what it already wrote stays in the ledger"""
+    try:
+        def deactivate(conn):
+            return conn.execute('UPDATE recurring_transactions SET is_active = 0 WHERE id = ?', (rule_id,)).rowcount
+        
+        if not db_writer.submit(deactivate):
+            return jsonify({'error': 'Recurring transaction not found'}), 404
+        return jsonify({'message': 'Recurring transaction stopped'})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/sinking-fund/<int:fund_id>/transaction', methods=['POST'])
 def sinking_fund_transaction(fund_id):
     """Add contribution or withdrawal to sinking fund"""
     try:
         transaction_type = request.form['transaction_type']  # 'contribution' or 'withdrawal'
-        amount = float(request.form['amount'])
+        amount = money.to_cents(request.form['amount'])
         description = request.form.get('description', '')
         date_str = request.form.get('date', datetime.now().date().isoformat())
         
-        conn = get_db_connection()
-        
-        # Get sinking fund details
-        fund = conn.execute('SELECT * FROM sinking_funds WHERE id = ?', (fund_id,)).fetchone()
-        if not fund:
-            conn.close()
-            return "Sinking fund not found", 404
-        
-        # For withdrawals, check if sufficient balance
-        if transaction_type == 'withdrawal' and fund['current_balance'] < amount:
-            conn.close()
-            return "Insufficient balance in sinking fund", 400
-        
-        # Create a general transaction record
-        # Map sinking funds to their appropriate categories
-        category_mapping = {
-            1: 11,  # Wife/Household -> Wife Support  
-            2: 2,   # Vehicle -> Car Expenses
-            3: 5,   # Emergency Fund -> Emergency Fund Build-Up
-            4: 3,   # Discretionary -> Prof. Dues + Prime (or create new)
-            5: 4    # Assembly/Convention -> Convention & Assembly
-        }
-        
-        category_id = category_mapping.get(fund_id, 5)  # Default to Emergency Fund Build-Up
-        
-        # Insert transaction
-        conn.execute('''
-            INSERT INTO transactions (date, description, amount, category_id, sinking_fund_id, transaction_type)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (date_str, description, amount, category_id, fund_id, transaction_type))
-        
-        # Update sinking fund balance
-        if transaction_type == 'contribution':
-            new_balance = fund['current_balance'] + amount
-        else:  # withdrawal
-            new_balance = fund['current_balance'] - amount
+        def record(conn):
+            # Get sinking fund details (the balance check and the write are one transaction)
+            fund = conn.execute('SELECT * FROM sinking_funds WHERE id = ?', (fund_id,)).fetchone()
+            if not fund:
+                return "Sinking fund not found", 404
             
-        conn.execute(
-            'UPDATE sinking_funds SET current_balance = ? WHERE id = ?',
-            (new_balance, fund_id)
-        )
+            # For withdrawals, check if sufficient balance
+            if transaction_type == 'withdrawal' and fund['current_balance'] < amount:
+                return "Insufficient balance in sinking fund", 400
+            
+            category_id = get_fund_category_id(conn, fund_id)
+            
+            # Insert transaction
+            conn.execute('''
+                INSERT INTO transactions (date, description, amount, category_id, sinking_fund_id, transaction_type)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (date_str, description, amount, category_id, fund_id, transaction_type))
+            rollups.apply_transaction(conn, date_str, category_id, amount, fund_id, transaction_type)
+            
+            # Update sinking fund balance
+            rollups.apply_fund_transaction(conn, fund_id, transaction_type, amount)
+            return None
         
-        conn.commit()
-        conn.close()
+        error = db_writer.submit(record)
+        if error:
+            return error
+        trend_engine.invalidate(date_str)
+        response_cache.invalidate('transactions', 'funds')
         
         return redirect(url_for('index'))
         
@@ -853,16 +1099,14 @@ def sinking_fund_transaction(fund_id):
 def edit_sinking_fund(fund_id):
     """Edit sinking fund target and monthly allocation"""
     try:
-        target_amount = float(request.form.get('target_amount', 0))
-        monthly_allocation = float(request.form.get('monthly_allocation', 0))
+        target_amount = money.to_cents(request.form.get('target_amount') or 0)
+        monthly_allocation = money.to_cents(request.form.get('monthly_allocation') or 0)
         
-        conn = get_db_connection()
-        conn.execute(
+        db_writer.submit(lambda conn: conn.execute(
             'UPDATE sinking_funds SET target_amount = ?, monthly_allocation = ? WHERE id = ?',
             (target_amount, monthly_allocation, fund_id)
-        )
-        conn.commit()
-        conn.close()
+        ))
+        response_cache.invalidate('funds')
         
         return redirect(url_for('index'))
         
@@ -873,28 +1117,15 @@ def edit_sinking_fund(fund_id):
 @app.route('/budget-setup')
 def budget_setup():
     """Show budget setup form"""
-    conn = get_db_connection()
-    
     # Get current month/year
     now = datetime.now()
     current_month = now.month
     current_year = now.year
     
-    # Get or create current budget period
-    budget_period = conn.execute(
-        'SELECT id FROM budget_periods WHERE month = ? AND year = ?',
-        (current_month, current_year)
-    ).fetchone()
+    # Get or create (rolling last month over) the current budget period
+    budget_period_id = ensure_current_budget_period()
     
-    if not budget_period:
-        conn.execute(
-            'INSERT INTO budget_periods (month, year) VALUES (?, ?)',
-            (current_month, current_year)
-        )
-        conn.commit()
-        budget_period_id = conn.lastrowid
-    else:
-        budget_period_id = budget_period['id']
+    conn = get_db_connection()
     
     # Get categories with current budget amounts
     budget_data = conn.execute('''
@@ -921,71 +1152,69 @@ def budget_setup():
                          current_month=current_month,
                          current_year=current_year)
 
+def parse_budget_amount(key, value):
+    """Form value -> non-negative cents (blank means 0); ValueError names the field"""
+    try:
+        amount = money.to_cents(value) if value.strip() else 0
+    except ValueError:
+        raise ValueError(f"{key} is not a number: {value!r}")
+    if amount < 0:
+        raise ValueError(f"{key} must be zero or a positive amount")
+    return amount
+
 @app.route('/budget-setup', methods=['POST'])
 def save_budget():
     """Save budget allocations and sinking fund settings"""
     try:
-        conn = get_db_connection()
-        
-        # Get current month/year
-        now = datetime.now()
-        current_month = now.month
-        current_year = now.year
-        
-        # Get budget period
-        budget_period = conn.execute(
-            'SELECT id FROM budget_periods WHERE month = ? AND year = ?',
-            (current_month, current_year)
-        ).fetchone()
-        
-        budget_period_id = budget_period['id']
-        
-        # Process each category budget
+        # Parse and validate the whole form before touching the database
+        allocations = {}
+        fund_settings = {}
         for key, value in request.form.items():
-            if key.startswith('budget_'):
-                category_id = int(key.replace('budget_', ''))
-                amount = float(value) if value else 0
-                
-                # Check if allocation already exists
-                existing = conn.execute(
-                    'SELECT id FROM budget_allocations WHERE budget_period_id = ? AND category_id = ?',
-                    (budget_period_id, category_id)
-                ).fetchone()
-                
-                if existing:
-                    # Update existing allocation
-                    conn.execute(
-                        'UPDATE budget_allocations SET budgeted_amount = ? WHERE id = ?',
-                        (amount, existing['id'])
-                    )
+            for prefix, field in (('budget_', None), ('sf_target_', 'target_amount'), ('sf_monthly_', 'monthly_allocation')):
+                if not key.startswith(prefix):
+                    continue
+                try:
+                    item_id = int(key[len(prefix):])
+                except ValueError:
+                    raise ValueError(f"bad field name {key!r}")
+                amount = parse_budget_amount(key, value)
+                if field is None:
+                    allocations[item_id] = amount
                 else:
-                    # Create new allocation
-                    conn.execute(
-                        'INSERT INTO budget_allocations (budget_period_id, category_id, budgeted_amount) VALUES (?, ?, ?)',
-                        (budget_period_id, category_id, amount)
-                    )
-            
-            # Process sinking fund settings
-            elif key.startswith('sf_target_'):
-                fund_id = int(key.replace('sf_target_', ''))
-                target_amount = float(value) if value else 0
-                
-                conn.execute(
-                    'UPDATE sinking_funds SET target_amount = ? WHERE id = ?',
-                    (target_amount, fund_id)
-                )
-            
-            elif key.startswith('sf_monthly_'):
-                fund_id = int(key.replace('sf_monthly_', ''))
-                monthly_allocation = float(value) if value else 0
-                
-                conn.execute(
-                    'UPDATE sinking_funds SET monthly_allocation = ? WHERE id = ?',
-                    (monthly_allocation, fund_id)
-                )
-        
-        conn.commit()
+                    fund_settings.setdefault(item_id, {})[field] = amount
+                break
+
+        conn = get_db_connection()
+        category_ids = {row['id'] for row in conn.execute('SELECT id FROM categories')}
+        fund_ids = {row['id'] for row in conn.execute('SELECT id FROM sinking_funds')}
+        unknown = [f"category {i}" for i in allocations if i not in category_ids]
+        unknown += [f"sinking fund {i}" for i in fund_settings if i not in fund_ids]
+        if unknown:
+            raise ValueError(f"unknown {', '.join(unknown)}")
+
         conn.close()
+
+        budget_period_id = ensure_current_budget_period()
+
+        def save(conn):
+            conn.executemany('''
+                INSERT INTO budget_allocations (budget_period_id, category_id, budgeted_amount)
+                VALUES (?, ?, ?)
+                ON CONFLICT (budget_period_id, category_id, IFNULL(subcategory_id, 0))
+                DO UPDATE SET budgeted_amount = excluded.budgeted_amount
+            ''', [(budget_period_id, category_id, amount) for category_id, amount in allocations.items()])
+
+            # A fund posted with only one of its two fields keeps the other as is
+            conn.executemany('''
+                UPDATE sinking_funds
+                SET target_amount = COALESCE(?, target_amount),
+                    monthly_allocation = COALESCE(?, monthly_allocation)
+                WHERE id = ?
+            ''', [(settings.get('target_amount'), settings.get('monthly_allocation'), fund_id)
+                  for fund_id, settings in fund_settings.items()])
+
+        db_writer.submit(save)
+        response_cache.invalidate('budgets', 'funds')
         
         return redirect(url_for('index'))
         
@@ -1052,7 +1281,7 @@ def update_transaction(transaction_id):
         # Get form data
         date_str = request.form['date']
         description = request.form['description']
-        amount = float(request.form['amount'])
+        amount = money.to_cents(request.form['amount'])
         category_id = int(request.form['category_id'])
         subcategory_id = request.form.get('subcategory_id')
         notes = request.form.get('notes', '')
@@ -1060,23 +1289,39 @@ def update_transaction(transaction_id):
         # Convert subcategory_id to int or None
         subcategory_id = int(subcategory_id) if subcategory_id else None
         
-        conn = get_db_connection()
+        def update(conn):
+            # Check if transaction exists
+            existing = conn.execute(
+                'SELECT date, amount, category_id, sinking_fund_id, transaction_type FROM transactions WHERE id = ?',
+                (transaction_id,)
+            ).fetchone()
+            if not existing:
+                return None
+            
+            # Update transaction
+            conn.execute('''
+                UPDATE transactions 
+                SET date = ?, description = ?, amount = ?, category_id = ?, subcategory_id = ?, notes = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (date_str, description, amount, category_id, subcategory_id, notes, transaction_id))
+            
+            # Move the amount in the monthly rollup from the old values to the new ones
+            rollups.apply_transaction_row(conn, existing, sign=-1)
+            rollups.apply_transaction(conn, date_str, category_id, amount,
+                                      existing['sinking_fund_id'], existing['transaction_type'])
+            
+            # Same for the fund balance if this was a sinking fund contribution/withdrawal
+            rollups.apply_fund_transaction(conn, existing['sinking_fund_id'], existing['transaction_type'],
+                                           existing['amount'], sign=-1)
+            rollups.apply_fund_transaction(conn, existing['sinking_fund_id'], existing['transaction_type'], amount)
+            return existing
         
-        # Check if transaction exists
-        existing = conn.execute('SELECT id FROM transactions WHERE id = ?', (transaction_id,)).fetchone()
+        existing = db_writer.submit(update)
         if not existing:
-            conn.close()
             return "Transaction not found", 404
-        
-        # Update transaction
-        conn.execute('''
-            UPDATE transactions 
-            SET date = ?, description = ?, amount = ?, category_id = ?, subcategory_id = ?, notes = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (date_str, description, amount, category_id, subcategory_id, notes, transaction_id))
-        
-        conn.commit()
-        conn.close()
+        trend_engine.invalidate(existing['date'])
+        trend_engine.invalidate(date_str)
+        response_cache.invalidate('transactions', 'funds')
         
         # Learn from this categorization choice (updates are also learning opportunities)
         learn_categorization_pattern(description, category_id)
@@ -1090,50 +1335,116 @@ def update_transaction(transaction_id):
 def delete_transaction(transaction_id):
     """Delete transaction"""
     try:
-        conn = get_db_connection()
-        
-        # Check if transaction exists
-        existing = conn.execute('SELECT id FROM transactions WHERE id = ?', (transaction_id,)).fetchone()
+        def delete(conn):
+            # Check if transaction exists
+            existing = conn.execute(
+                'SELECT date, amount, category_id, sinking_fund_id, transaction_type FROM transactions WHERE id = ?',
+                (transaction_id,)
+            ).fetchone()
+            if not existing:
+                return None
+            
+            # Delete transaction
+            conn.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
+            rollups.apply_transaction_row(conn, existing, sign=-1)
+            rollups.apply_fund_transaction(conn, existing['sinking_fund_id'], existing['transaction_type'],
+                                           existing['amount'], sign=-1)
+            return existing
+        
+        existing = db_writer.submit(delete)
         if not existing:
-            conn.close()
             return "Transaction not found", 404
-        
-        # Delete transaction
-        conn.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
-        conn.commit()
-        conn.close()
+        trend_engine.invalidate(existing['date'])
+        response_cache.invalidate('transactions', 'funds')
         
         return redirect(url_for('index'))
         
     except Exception as e:
         return f"Error deleting transaction: {str(e)}", 400
 
+# Whether transactions_fts exists in this database (checked once per process)
+fts_enabled = None
+
+def search_uses_fts(conn):
+    global fts_enabled
+    if fts_enabled is None:
+        fts_enabled = fts.fts_table_exists(conn)
+    return fts_enabled
+
+app.add_template_filter(fts.highlight, 'highlight')
+
+# Transactions list paging
+TRANSACTIONS_PAGE_SIZE = 50
+TRANSACTIONS_MAX_PAGE_SIZE = 500
+
+def encode_page_cursor(row):
+    """Opaque cursor for a row's position in (date, created_at, id) order"""
+    raw = json.dumps([str(row['date']), row['created_at'], row['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_page_cursor(cursor):
+    """Inverse of encode_page_cursor; raises ValueError on a malformed cursor"""
+    try:
+        txn_date, created_at, txn_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(txn_date), str(created_at), int(txn_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Invalid page cursor: {e}")
+
 @app.route('/transactions')
 def all_transactions():
-    """Show all transactions with search/filter"""
+    """Show transactions with search/filter, one keyset page at a time (or streamed)"""
     # Get filter parameters
     search = request.args.get('search', '')
     category_filter = request.args.get('category', '')
     date_from = request.args.get('date_from', '')
     date_to = request.args.get('date_to', '')
     
-    conn = get_db_connection()
+    # Paging parameters: ?after=<cursor> for the next page, ?before=<cursor> for the previous one
+    after = request.args.get('after', '')
+    before = request.args.get('before', '')
+    stream = request.args.get('stream') == '1'
+    sort = request.args.get('sort', '')
+    try:
+        per_page = int(request.args.get('per_page', TRANSACTIONS_PAGE_SIZE))
+    except ValueError:
+        per_page = TRANSACTIONS_PAGE_SIZE
+    per_page = max(1, min(per_page, TRANSACTIONS_MAX_PAGE_SIZE))
     
-    # Build query with filters
-    query = '''
-        SELECT t.*, c.name as category_name, sc.name as subcategory_name,
-               sf.name as sinking_fund_name, t.transaction_type
-        FROM transactions t
-        JOIN categories c ON t.category_id = c.id
-        LEFT JOIN subcategories sc ON t.subcategory_id = sc.id
-        LEFT JOIN sinking_funds sf ON t.sinking_fund_id = sf.id
-        WHERE 1=1
-    '''
-    params = []
+    conn = get_db_connection()
     
-    if search:
-        query += ' AND (t.description LIKE ? OR t.notes LIKE ?)'
-        params.extend([f'%{search}%', f'%{search}%'])
+    # Full-text search goes through transactions_fts when this SQLite has FTS5
+    match_query = fts.build_match_query(search) if search and search_uses_fts(conn) else None
+    
+    # Build query with filters (each combination is backed by
+    # idx_transactions_date_created or idx_transactions_category_date_created)
+    if match_query:
+        query = f'''
+            SELECT t.*, c.name as category_name, sc.name as subcategory_name,
+                   sf.name as sinking_fund_name, t.transaction_type,
+                   {fts.snippet_column()} as search_snippet
+            FROM transactions_fts
+            JOIN transactions t ON t.id = transactions_fts.rowid
+            JOIN categories c ON t.category_id = c.id
+            LEFT JOIN subcategories sc ON t.subcategory_id = sc.id
+            LEFT JOIN sinking_funds sf ON t.sinking_fund_id = sf.id
+            WHERE transactions_fts MATCH ?
+        '''
+        params = [match_query]
+    else:
+        query = '''
+            SELECT t.*, c.name as category_name, sc.name as subcategory_name,
+                   sf.name as sinking_fund_name, t.transaction_type
+            FROM transactions t
+            JOIN categories c ON t.category_id = c.id
+            LEFT JOIN subcategories sc ON t.subcategory_id = sc.id
+            LEFT JOIN sinking_funds sf ON t.sinking_fund_id = sf.id
+            WHERE 1=1
+        '''
+        params = []
+        
+        if search:
+            query += ' AND (t.description LIKE ? OR t.notes LIKE ?)'
+            params.extend([f'%{search}%', f'%{search}%'])
     
     if category_filter:
         query += ' AND t.category_id = ?'
@@ -1147,22 +1458,81 @@ def all_transactions():
         query += ' AND t.date <= ?'
         params.append(date_to)
     
-    query += ' ORDER BY t.date DESC, t.created_at DESC'
+    filters = {
+        'search': search,
+        'category': category_filter,
+        'date_from': date_from,
+        'date_to': date_to,
+        'sort': sort if match_query else ''
+    }
+    categories = conn.execute('SELECT * FROM categories ORDER BY name').fetchall()
+    
+    if match_query and sort == 'relevance':
+        # Best bm25 matches first; ranking is a single page, date order pages through everything
+        query += ' ORDER BY transactions_fts.rank, t.id DESC LIMIT ?'
+        params.append(per_page)
+        transactions = conn.execute(query, params).fetchall()
+        conn.close()
+        return render_template('all_transactions.html',
+                             transactions=transactions,
+                             categories=categories,
+                             filters=filters,
+                             streaming=False,
+                             page={'per_page': per_page, 'next_url': None, 'prev_url': None})
+    
+    if stream:
+        # Every matching row, rendered as the cursor produces them
+        query += ' ORDER BY t.date DESC, t.created_at DESC, t.id DESC'
+        transactions = conn.execute(query, params)
+        return Response(stream_template('all_transactions.html',
+                                        transactions=transactions,
+                                        categories=categories,
+                                        filters=filters,
+                                        streaming=True,
+                                        page={}))
+    
+    try:
+        if before:
+            query += ' AND (t.date, t.created_at, t.id) > (?, ?, ?)'
+            params.extend(decode_page_cursor(before))
+        elif after:
+            query += ' AND (t.date, t.created_at, t.id) < (?, ?, ?)'
+            params.extend(decode_page_cursor(after))
+    except ValueError as e:
+        conn.close()
+        return str(e), 400
+    
+    # Walk the index backwards for the previous page, then flip the rows back
+    if before:
+        query += ' ORDER BY t.date ASC, t.created_at ASC, t.id ASC LIMIT ?'
+    else:
+        query += ' ORDER BY t.date DESC, t.created_at DESC, t.id DESC LIMIT ?'
+    params.append(per_page + 1)
     
     transactions = conn.execute(query, params).fetchall()
-    categories = conn.execute('SELECT * FROM categories ORDER BY name').fetchall()
+    has_more = len(transactions) > per_page
+    transactions = transactions[:per_page]
+    if before:
+        transactions.reverse()
     
     conn.close()
     
+    page_args = {key: value for key, value in filters.items() if value}
+    if per_page != TRANSACTIONS_PAGE_SIZE:
+        page_args['per_page'] = per_page
+    page = {'per_page': per_page, 'next_url': None, 'prev_url': None}
+    if transactions:
+        if has_more or before:
+            page['next_url'] = url_for('all_transactions', after=encode_page_cursor(transactions[-1]), **page_args)
+        if (has_more and before) or after:
+            page['prev_url'] = url_for('all_transactions', before=encode_page_cursor(transactions[0]), **page_args)
+    
     return render_template('all_transactions.html', 
                          transactions=transactions,
                          categories=categories,
-                         filters={
-                             'search': search,
-                             'category': category_filter,
-                             'date_from': date_from,
-                             'date_to': date_to
-                         })
+                         filters=filters,
+                         streaming=False,
+                         page=page)
 
 @app.route('/add-transaction')
 def add_transaction_form():
@@ -1174,6 +1544,7 @@ def add_transaction_form():
     return render_template('add_transaction.html', categories=categories)
 
 @app.route('/api/subcategories/<int:category_id>')
+@response_cache.cached_view('categories')
 def get_subcategories(category_id):
     """Get subcategories for a category (AJAX endpoint)"""
     conn = get_db_connection()
@@ -1192,7 +1563,7 @@ def add_transaction():
         # Get form data
         date_str = request.form['date']
         description = request.form['description']
-        amount = float(request.form['amount'])
+        amount = money.to_cents(request.form['amount'])
         category_id = int(request.form['category_id'])
         subcategory_id = request.form.get('subcategory_id')
         notes = request.form.get('notes', '')
@@ -1200,13 +1571,16 @@ def add_transaction():
         # Convert subcategory_id to int or None
         subcategory_id = int(subcategory_id) if subcategory_id else None
         
-        conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO transactions (date, description, amount, category_id, subcategory_id, notes)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (date_str, description, amount, category_id, subcategory_id, notes))
-        conn.commit()
-        conn.close()
+        def insert(conn):
+            conn.execute('''
+                INSERT INTO transactions (date, description, amount, category_id, subcategory_id, notes)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (date_str, description, amount, category_id, subcategory_id, notes))
+            rollups.apply_transaction(conn, date_str, category_id, amount)
+        
+        db_writer.submit(insert)
+        trend_engine.invalidate(date_str)
+        response_cache.invalidate('transactions')
         
         # Learn from this categorization choice
         learn_categorization_pattern(description, category_id)
@@ -1217,6 +1591,49 @@ def add_transaction():
         # In production, you'd want better error handling
         return f"Error: {str(e)}", 400
 
+@app.route('/import-transactions')
+def import_transactions_form():
+    """Show bank statement upload form"""
+    conn = get_db_connection()
+    categories = conn.execute('SELECT * FROM categories ORDER BY name').fetchall()
+    conn.close()
+    
+    return render_template('import_transactions.html', categories=categories, stats=None)
+
+@app.route('/import-transactions', methods=['POST'])
+def import_transactions():
+    """Import a CSV/OFX bank statement, auto-categorizing each row"""
+    statement = request.files.get('statement')
+    if not statement or not statement.filename:
+        return "Error: choose a statement file to import", 400
+    
+    default_category_id = request.form.get('default_category_id')
+    default_category_id = int(default_category_id) if default_category_id else None
+    file_format = request.form.get('format') or importer.detect_format(statement.filename)
+    
+    conn = get_db_connection()
+    try:
+        # Read the upload as a text stream so large files are never held in memory
+        stream = io.TextIOWrapper(statement.stream, encoding='utf-8-sig', errors='replace', newline='')
+        rows = importer.parse_statement(stream, file_format, request.form.get('date_format') or None)
+        stats = importer.import_statement(conn, rows, get_category_suggestions,
+                                          default_category_id=default_category_id,
+                                          include_credits=request.form.get('include_credits') == 'on',
+                                          submit=db_writer.submit)
+    except (importer.StatementError, sqlite3.Error) as e:
+        conn.close()
+        # Chunks committed before the error are still in the ledger
+        response_cache.invalidate('transactions')
+        trend_engine.invalidate()
+        return f"Error importing statement: {str(e)}", 400
+    
+    categories = conn.execute('SELECT * FROM categories ORDER BY name').fetchall()
+    conn.close()
+    response_cache.invalidate('transactions')
+    trend_engine.invalidate()
+    
+    return render_template('import_transactions.html', categories=categories, stats=stats)
+
 @app.route('/api/categories', methods=['POST'])
 def add_category():
     """Add a new category"""
@@ -1225,20 +1642,20 @@ def add_category():
         if not name:
             return jsonify({'error': 'Category name is required'}), 400
         
-        conn = get_db_connection()
+        def add(conn):
+            # Check if category already exists
+            existing = conn.execute('SELECT id FROM categories WHERE name = ?', (name,)).fetchone()
+            if existing:
+                return None
+            
+            # Add new category
+            return conn.execute('INSERT INTO categories (name) VALUES (?)', (name,)).lastrowid
         
-        # Check if category already exists
-        existing = conn.execute('SELECT id FROM categories WHERE name = ?', (name,)).fetchone()
-        if existing:
-            conn.close()
+        category_id = db_writer.submit(add)
+        if category_id is None:
             return jsonify({'error': 'Category already exists'}), 400
-        
-        # Add new category
-        cursor = conn.execute('INSERT INTO categories (name) VALUES (?)', (name,))
-        category_id = cursor.lastrowid
-        
-        conn.commit()
-        conn.close()
+        response_cache.invalidate('categories')
+        suggestion_index.set_category_name(category_id, name)
         
         return jsonify({'id': category_id, 'name': name, 'message': 'Category added successfully'})
         
@@ -1253,61 +1670,104 @@ def update_category(category_id):
         if not name:
             return jsonify({'error': 'Category name is required'}), 400
         
-        conn = get_db_connection()
+        def rename(conn):
+            # Check if category exists
+            existing = conn.execute('SELECT id FROM categories WHERE id = ?', (category_id,)).fetchone()
+            if not existing:
+                return 'Category not found', 404
+            
+            # Check if new name conflicts with existing category
+            conflict = conn.execute('SELECT id FROM categories WHERE name = ? AND id != ?', (name, category_id)).fetchone()
+            if conflict:
+                return 'Category name already exists', 400
+            
+            # Update category
+            conn.execute('UPDATE categories SET name = ? WHERE id = ?', (name, category_id))
+            return None
         
-        # Check if category exists
-        existing = conn.execute('SELECT id FROM categories WHERE id = ?', (category_id,)).fetchone()
-        if not existing:
-            conn.close()
-            return jsonify({'error': 'Category not found'}), 404
-        
-        # Check if new name conflicts with existing category
-        conflict = conn.execute('SELECT id FROM categories WHERE name = ? AND id != ?', (name, category_id)).fetchone()
-        if conflict:
-            conn.close()
-            return jsonify({'error': 'Category name already exists'}), 400
-        
-        # Update category
-        conn.execute('UPDATE categories SET name = ? WHERE id = ?', (name, category_id))
-        conn.commit()
-        conn.close()
+        error = db_writer.submit(rename)
+        if error:
+            return jsonify({'error': error[0]}), error[1]
+        response_cache.invalidate('categories')
+        suggestion_index.set_category_name(category_id, name)
         
         return jsonify({'message': 'Category updated successfully'})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def get_category_usage_counts(conn, category_id=None):
+    """Per category: transactions, active (> 0) budget allocations, sinking funds and active recurring rules, in one query"""
+    if category_id is not None:
+        category_filter, params = 'AND category_id = ?', [category_id] * 4
+    else:
+        category_filter, params = '', []
+    rows = conn.execute(f'''
+        SELECT category_id,
+               SUM(transaction_count) AS transaction_count,
+               SUM(budget_count) AS budget_count,
+               SUM(fund_count) AS fund_count,
+               SUM(recurring_count) AS recurring_count
+        FROM (
+            SELECT category_id, COUNT(*) AS transaction_count, 0 AS budget_count, 0 AS fund_count,
+                   0 AS recurring_count
+            FROM transactions
+            WHERE category_id IS NOT NULL {category_filter}
+            GROUP BY category_id
+            UNION ALL
+            SELECT category_id, 0, COUNT(*), 0, 0
+            FROM budget_allocations
+            WHERE budgeted_amount > 0 {category_filter}
+            GROUP BY category_id
+            UNION ALL
+            SELECT category_id, 0, 0, COUNT(*), 0
+            FROM sinking_funds
+            WHERE category_id IS NOT NULL {category_filter}
+            GROUP BY category_id
+            UNION ALL
+            SELECT category_id, 0, 0, 0, COUNT(*)
+            FROM recurring_transactions
+            WHERE is_active = 1 {category_filter}
+            GROUP BY category_id
+        )
+        GROUP BY category_id
+    ''', params).fetchall()
+    return {row['category_id']: {'transaction_count': row['transaction_count'],
+                                 'budget_count': row['budget_count'],
+                                 'fund_count': row['fund_count'],
+                                 'recurring_count': row['recurring_count']} for row in rows}
+
 @app.route('/api/categories/<int:category_id>', methods=['DELETE'])
 def delete_category(category_id):
-    """Delete category (only if no transactions use it and no active budgets)"""
+    """Delete category (only if nothing uses it: no transactions, active budgets, funds or active recurring rules)"""
     try:
-        conn = get_db_connection()
-        
-        # Check if category has transactions
-        transactions_count = conn.execute(
-            'SELECT COUNT(*) as count FROM transactions WHERE category_id = ?', 
-            (category_id,)
-        ).fetchone()
-        
-        if transactions_count['count'] > 0:
-            conn.close()
-            return jsonify({'error': f'Cannot delete category. It has {transactions_count["count"]} transactions.'}), 400
-        
-        # Check if category has budget allocations > 0
-        budget_count = conn.execute(
-            'SELECT COUNT(*) as count FROM budget_allocations WHERE category_id = ? AND budgeted_amount > 0', 
-            (category_id,)
-        ).fetchone()
-        
-        if budget_count['count'] > 0:
-            conn.close()
-            return jsonify({'error': 'Cannot delete category. It has active budget allocations.'}), 400
-        
-        # Delete category and any $0 budget allocations
-        conn.execute('DELETE FROM budget_allocations WHERE category_id = ?', (category_id,))
-        conn.execute('DELETE FROM categories WHERE id = ?', (category_id,))
-        conn.commit()
-        conn.close()
+        def delete(conn):
+            # Check if category has transactions, budget allocations > 0, sinking funds or active recurring rules
+            counts = get_category_usage_counts(conn, category_id).get(category_id, {})
+            
+            if counts.get('transaction_count'):
+                return f'Cannot delete category. It has {counts["transaction_count"]} transactions.', 400
+            
+            if counts.get('budget_count'):
+                return 'Cannot delete category. It has active budget allocations.', 400
+            
+            if counts.get('fund_count'):
+                return 'Cannot delete category. Sinking funds are filed under it.', 400
+            
+            if counts.get('recurring_count'):
+                return f'Cannot delete category. It has {counts["recurring_count"]} active recurring transactions.', 400
+            
+            # Delete category and any $0 budget allocations
+            conn.execute('DELETE FROM budget_allocations WHERE category_id = ?', (category_id,))
+            conn.execute('DELETE FROM categories WHERE id = ?', (category_id,))
+            return None
+        
+        error = db_writer.submit(delete)
+        if error:
+            return jsonify({'error': error[0]}), error[1]
+        response_cache.invalidate('categories')
+        trend_engine.invalidate()
+        suggestion_index.remove_category(category_id)
         
         return jsonify({'message': 'Category deleted successfully'})
         
@@ -1320,27 +1780,19 @@ def manage_categories():
     conn = get_db_connection()
     
     # Get all categories with transaction counts (only count budget allocations > 0)
-    categories_data = []
     categories = conn.execute('SELECT id, name FROM categories ORDER BY name').fetchall()
+    usage_counts = get_category_usage_counts(conn)
     
+    categories_data = []
     for category in categories:
-        # Count transactions for this category
-        transaction_count = conn.execute(
-            'SELECT COUNT(*) as count FROM transactions WHERE category_id = ?',
-            (category['id'],)
-        ).fetchone()['count']
-        
-        # Count budget allocations > 0 for this category
-        budget_count = conn.execute(
-            'SELECT COUNT(*) as count FROM budget_allocations WHERE category_id = ? AND budgeted_amount > 0',
-            (category['id'],)
-        ).fetchone()['count']
-        
+        counts = usage_counts.get(category['id'], {})
         categories_data.append({
             'id': category['id'],
             'name': category['name'],
-            'transaction_count': transaction_count,
-            'budget_count': budget_count
+            'transaction_count': counts.get('transaction_count', 0),
+            'budget_count': counts.get('budget_count', 0),
+            'fund_count': counts.get('fund_count', 0),
+            'recurring_count': counts.get('recurring_count', 0)
         })
     
     conn.close()
@@ -1354,6 +1806,8 @@ if __name__ == '__main__':
     
     # Always check if tables exist (for cloud deployments)
     init_db_if_needed()
+    start_worker()
     
+    # Development server; production runs gunicorn with gunicorn.conf.py (see Procfile)
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
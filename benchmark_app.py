@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+# End-to-end route benchmark: generates a seeded database (generate_data.py),
+# drives the main pages and APIs through the Flask test client, and reports
+# p50/p95/p99 latency, SQL statements per request and peak RSS. Results are
+# compared with a stored baseline; a scenario regresses when its p95 grows
+# by more than --tolerance and by more than --min-delta-ms (so timer noise on
+# sub-millisecond routes is not a regression), when the peak RSS grows by
+# more than --tolerance, or when it runs more queries.
+# The response cache is off unless --cache is given, so the timings are of
+# the real query and render path.
+#
+#   python benchmark_app.py [--years 3] [--iterations 50] [--baseline benchmark_baseline.json]
+#   python benchmark_app.py --update-baseline
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(REPO_DIR, 'benchmark_baseline.json')
+DEFAULT_TOLERANCE = 0.5
+# Smallest p95 growth, in ms, that counts as a regression whatever the ratio
+DEFAULT_MIN_DELTA_MS = 2.0
+
+SUGGESTION_TERMS = ['grocery', 'coffee shop', 'shell', 'amaz', 'netflix', 'electric company #12']
+
+
+def scenarios(today):
+    month_start = date(today.year, today.month, 1).isoformat()
+    year_start = date(today.year, 1, 1).isoformat()
+    return [
+        ('dashboard', 'GET', '/', None),
+        ('analytics', 'GET', '/analytics', None),
+        ('analytics_category_spending', 'GET', '/api/analytics/category-spending', None),
+        ('analytics_budget_vs_actual', 'GET', '/api/analytics/budget-vs-actual', None),
+        ('analytics_trends', 'GET', '/api/analytics/trends', None),
+        ('transactions', 'GET', '/transactions', None),
+        ('transactions_category', 'GET', '/transactions?category=7', None),
+        ('transactions_date_range', 'GET', f'/transactions?date_from={year_start}&date_to={today.isoformat()}', None),
+        ('transactions_search', 'GET', '/transactions?search=grocery', None),
+        ('transactions_month_category', 'GET', f'/transactions?category=8&date_from={month_start}', None),
+        ('category_suggestions', 'GET', '/api/category-suggestions?description={term}', None),
+        ('add_transaction', 'POST', '/add-transaction', {
+            'date': today.isoformat(), 'description': 'Benchmark Coffee Shop', 'amount': '4.75', 'category_id': '7'
+        }),
+    ]
+
+
+# Transaction control isn't a query
+CONTROL_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+class QueryCounter:
+    """Counts SQL statements the app runs on its connections, via sqlite3 trace callbacks"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def __call__(self, statement):
+        # The trace also reports trigger bodies ('-- TRIGGER ...') and FTS5's
+        # own statements on its shadow tables ('main'.'transactions_fts_...')
+        if statement.startswith('--') or "'main'." in statement or statement.lstrip().upper().startswith(CONTROL_STATEMENTS):
+            return
+        with self._lock:
+            self.count += 1
+
+    def instrument(self, connect):
+        def traced_connect(*args, **kwargs):
+            conn = connect(*args, **kwargs)
+            conn.set_trace_callback(self)
+            return conn
+        return traced_connect
+
+    def take(self):
+        with self._lock:
+            count, self.count = self.count, 0
+        return count
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux (bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(args):
+    import generate_data
+    import migrations
+
+    workdir = tempfile.mkdtemp(prefix='budget-bench-')
+    migrations.SCHEMA_FILE = os.path.join(REPO_DIR, 'schema.sql')
+    start = time.perf_counter()
+    counts = generate_data.generate(os.path.join(workdir, 'budget_tracker.db'), args.years, args.per_day, args.seed)
+    print(f"Generated {counts['transactions']:,} transactions ({args.years} years) in {time.perf_counter() - start:.1f}s")
+
+    # The app's DATABASE is relative; configure it before importing
+    os.chdir(workdir)
+    if not args.cache:
+        os.environ['RESPONSE_CACHE_SIZE'] = '0'
+    # Keep the background pattern writer from landing in the middle of a measurement
+    os.environ.setdefault('LEARNING_FLUSH_MS', '3600000')
+    sys.path.insert(0, REPO_DIR)
+    import app as app_module
+
+    counter = QueryCounter()
+    app_module.db_pool._connect = counter.instrument(app_module.db_pool._connect)
+    app_module.db_writer._connect = counter.instrument(app_module.db_writer._connect)
+    app_module.init_db_if_needed()
+    app_module.start_worker()
+    client = app_module.app.test_client()
+
+    results = {}
+    try:
+        for name, method, path, data in scenarios(date.today()):
+            if args.only and name not in args.only:
+                continue
+            latencies = []
+            queries = []
+            for i in range(args.warmup + args.iterations):
+                url = path.format(term=SUGGESTION_TERMS[i % len(SUGGESTION_TERMS)])
+                counter.take()
+                started = time.perf_counter()
+                response = client.open(url, method=method, data=data)
+                # Consume the body so streamed pages are fully rendered inside the timing
+                response.get_data()
+                elapsed = time.perf_counter() - started
+                if response.status_code >= 400:
+                    raise SystemExit(f"{name}: {method} {url} returned {response.status_code}")
+                if i >= args.warmup:
+                    latencies.append(elapsed * 1000)
+                    queries.append(counter.take())
+            results[name] = {
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p95_ms': round(percentile(latencies, 95), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+                'queries': max(queries),
+            }
+    finally:
+        app_module.shutdown()
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'dataset': {'years': args.years, 'per_day': args.per_day, 'seed': args.seed,
+                    'transactions': counts['transactions']},
+        'iterations': args.iterations,
+        'cache': args.cache,
+        'peak_rss_mb': peak_rss_mb(),
+        'scenarios': results,
+    }
+
+
+def compare(report, baseline, tolerance, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """Return a list of regression messages (empty when within tolerance)"""
+    regressions = []
+    # The transaction count follows today's date, so only the generator settings are compared
+    settings = ('years', 'per_day', 'seed')
+    same_dataset = all(report['dataset'][key] == baseline.get('dataset', {}).get(key) for key in settings)
+    if not same_dataset or report['cache'] != baseline.get('cache'):
+        print("Note: dataset or cache setting differs from the baseline's; comparison is approximate")
+    for name, result in report['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if base is None:
+            continue
+        if (result['p95_ms'] > base['p95_ms'] * (1 + tolerance)
+                and result['p95_ms'] - base['p95_ms'] > min_delta_ms):
+            regressions.append(f"{name}: p95 {result['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if result['queries'] > base['queries']:
+            regressions.append(f"{name}: {result['queries']} queries per request vs baseline {base['queries']}")
+    base_rss = baseline.get('peak_rss_mb')
+    if base_rss and report['peak_rss_mb'] > base_rss * (1 + tolerance):
+        regressions.append(f"peak RSS {report['peak_rss_mb']} MB vs baseline {base_rss} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end route benchmark against a stored baseline')
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--per-day', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--cache', action='store_true', help='leave the response cache on')
+    parser.add_argument('--only', nargs='+', help='scenario names to run')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed relative growth of p95 latency and peak RSS (0.5 = 50%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help='p95 growth below this many ms is never a regression')
+    parser.add_argument('--update-baseline', action='store_true', help='write this run as the new baseline')
+    parser.add_argument('--output', help='also write this run as JSON to a file')
+    args = parser.parse_args()
+
+    report = run(args)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print(f"\n{'scenario':<30}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'base p95':>10}")
+    for name, result in report['scenarios'].items():
+        base = (baseline or {}).get('scenarios', {}).get(name)
+        base_p95 = f"{base['p95_ms']:.2f}" if base else '-'
+        print(f"{name:<30}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+              f"{result['queries']:>9}{base_p95:>10}")
+    print(f"peak RSS: {report['peak_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline}")
+        return
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+
+    regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        sys.exit(1)
+    print("OK: no regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
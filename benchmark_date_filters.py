@@ -0,0 +1,118 @@
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from app import get_month_bounds
+
+# Compares the old strftime() month filter with the half-open date range
+# used by index(), analytics() and debug_detailed(). The database is built
+# from schema.sql, so it has the (date, ...) and (category_id, date, ...)
+# transaction indexes.
+#
+#   python benchmark_date_filters.py [row_count]
+
+ROW_COUNT = 1_000_000
+YEARS = 10
+CHUNK = 50_000
+
+
+def build_database(path, row_count):
+    conn = sqlite3.connect(path)
+    with open('schema.sql', 'r') as f:
+        conn.executescript(f.read())
+
+    rng = random.Random(42)
+    category_ids = [row[0] for row in conn.execute('SELECT id FROM categories')]
+    first_day = date.today() - timedelta(days=365 * YEARS)
+    words = ['grocery', 'fuel', 'coffee', 'rent', 'internet', 'pharmacy', 'dinner', 'insurance']
+
+    inserted = 0
+    while inserted < row_count:
+        batch = []
+        for _ in range(min(CHUNK, row_count - inserted)):
+            day = first_day + timedelta(days=rng.randrange(365 * YEARS + 1))
+            batch.append((day.isoformat(), f'{rng.choice(words)} {rng.randrange(1000)}',
+                          rng.randrange(100, 50001), rng.choice(category_ids)))
+        conn.executemany(
+            'INSERT INTO transactions (date, description, amount, category_id) VALUES (?, ?, ?, ?)',
+            batch
+        )
+        conn.commit()
+        inserted += len(batch)
+    conn.execute('ANALYZE')
+    conn.commit()
+    return conn
+
+
+def query_plan(conn, sql, params):
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def time_query(conn, sql, params, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else ROW_COUNT
+    today = date.today()
+    month_start, month_end = get_month_bounds(today.year, today.month)
+
+    old_sql = '''
+        SELECT c.name AS category, SUM(t.amount) AS total_spent
+        FROM transactions t
+        JOIN categories c ON t.category_id = c.id
+        WHERE strftime('%m', t.date) = ? AND strftime('%Y', t.date) = ?
+          AND t.sinking_fund_id IS NULL
+        GROUP BY c.id, c.name
+    '''
+    old_params = (f'{today.month:02d}', str(today.year))
+    new_sql = '''
+        SELECT c.name AS category, SUM(t.amount) AS total_spent
+        FROM transactions t
+        JOIN categories c ON t.category_id = c.id
+        WHERE t.date >= ? AND t.date < ?
+          AND t.sinking_fund_id IS NULL
+        GROUP BY c.id, c.name
+    '''
+    new_params = (month_start, month_end)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        print(f"Generating {row_count:,} transactions...")
+        start = time.perf_counter()
+        conn = build_database(path, row_count)
+        print(f"Generated in {time.perf_counter() - start:.1f}s")
+
+        for label, sql, params in (('strftime filter', old_sql, old_params),
+                                   ('date range filter', new_sql, new_params)):
+            print(f"\n{label}:")
+            for step in query_plan(conn, sql, params):
+                print(f"  {step}")
+            print(f"  best of 5: {time_query(conn, sql, params) * 1000:.2f} ms")
+
+        old_plan = ' '.join(query_plan(conn, old_sql, old_params))
+        new_plan = ' '.join(query_plan(conn, new_sql, new_params))
+        conn.close()
+
+    # strftime() hides t.date from the planner, so every transaction is visited
+    # (either a table SCAN or a walk of each category's full index range).
+    if 'date>? AND date<?' in old_plan:
+        print("\nUnexpected: strftime filter used a date index")
+    if 'date>? AND date<?' not in new_plan or 'SEARCH t' not in new_plan:
+        print("\nFAIL: date range filter is not using a date index")
+        sys.exit(1)
+    print("\nOK: plan changed from a full SCAN to an index SEARCH on the date range")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+import time
+
+import search as fts
+from benchmark_date_filters import build_database, time_query
+
+# Compares the transaction search box's LIKE '%x%' path with the FTS5 path
+# used by all_transactions(). Very common terms can favour LIKE when results
+# are ordered by date with a small LIMIT (the date index is walked and stops
+# early), while selective or missing terms favour FTS by orders of magnitude.
+#
+#   python benchmark_search.py [row_count]
+
+ROW_COUNT = 1_000_000
+TERMS = ['grocery', 'coff', 'insurance 12', 'zzz']
+PAGE = 51
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else ROW_COUNT
+
+    like_sql = '''
+        SELECT t.id FROM transactions t
+        WHERE (t.description LIKE ? OR t.notes LIKE ?)
+        ORDER BY t.date DESC, t.created_at DESC, t.id DESC LIMIT ?
+    '''
+    fts_sql = '''
+        SELECT t.id FROM transactions_fts
+        JOIN transactions t ON t.id = transactions_fts.rowid
+        WHERE transactions_fts MATCH ?
+        ORDER BY t.date DESC, t.created_at DESC, t.id DESC LIMIT ?
+    '''
+    ranked_sql = '''
+        SELECT t.id FROM transactions_fts
+        JOIN transactions t ON t.id = transactions_fts.rowid
+        WHERE transactions_fts MATCH ?
+        ORDER BY transactions_fts.rank LIMIT ?
+    '''
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        print(f"Generating {row_count:,} transactions...")
+        conn = build_database(path, row_count)
+        start = time.perf_counter()
+        if not fts.ensure_fts(conn):
+            print("FTS5 is not available in this SQLite build; nothing to compare")
+            sys.exit(1)
+        print(f"Built FTS index in {time.perf_counter() - start:.1f}s")
+
+        print(f"\n{'term':<16}{'LIKE ms':>12}{'FTS ms':>12}{'ranked ms':>12}{'speedup':>10}")
+        for term in TERMS:
+            match_query = fts.build_match_query(term)
+            like_ms = time_query(conn, like_sql, (f'%{term}%', f'%{term}%', PAGE), repeat=3) * 1000
+            fts_ms = time_query(conn, fts_sql, (match_query, PAGE), repeat=3) * 1000
+            ranked_ms = time_query(conn, ranked_sql, (match_query, PAGE), repeat=3) * 1000
+            print(f"{term:<16}{like_ms:>12.2f}{fts_ms:>12.2f}{ranked_ms:>12.2f}{like_ms / fts_ms:>9.1f}x")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import http.client
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from urllib.parse import urlencode
+
+# Requests/sec for the dashboard (GET /) and for POST /add-transaction under
+# gunicorn with 1, 4 and 8 worker processes. Each run starts the server from
+# gunicorn.conf.py on a fresh database in a scratch directory and drives it
+# with keep-alive client threads for a fixed duration.
+#
+#   python benchmark_workers.py [--workers 1 4 8] [--clients 32] [--duration 10]
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workdir, port, workers, threads):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads), PORT=str(port))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', os.path.join(REPO_DIR, 'gunicorn.conf.py'),
+         '--pythonpath', REPO_DIR, '--bind', f'127.0.0.1:{port}', 'app:app'],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise SystemExit(f"gunicorn with {workers} workers did not start")
+
+
+def drive(port, clients, duration, method, path, body=None):
+    """Hammer one endpoint from `clients` keep-alive connections; returns (requests/sec, errors)"""
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+    counts = [0] * clients
+    errors = [0] * clients
+    stop = time.monotonic() + duration
+
+    def client(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while time.monotonic() < stop:
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    errors[i] += 1
+                counts[i] += 1
+            except (OSError, http.client.HTTPException):
+                errors[i] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.monotonic() - start), sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Requests/sec under gunicorn at several worker counts')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--threads', type=int, default=4, help='GUNICORN_THREADS per worker')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent client connections')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per endpoint')
+    args = parser.parse_args()
+
+    body = urlencode({'date': date.today().isoformat(), 'description': 'benchmark coffee',
+                      'amount': '4.50', 'category_id': '7'})
+    print(f"{args.clients} clients, {args.duration:g}s per endpoint, {args.threads} threads per worker")
+    print(f"{'workers':>7} {'GET / req/s':>12} {'errors':>7} {'POST /add-transaction req/s':>28} {'errors':>7}")
+    for workers in args.workers:
+        workdir = tempfile.mkdtemp(prefix='budget-workers-')
+        shutil.copy(os.path.join(REPO_DIR, 'schema.sql'), workdir)
+        port = free_port()
+        server = start_server(workdir, port, workers, args.threads)
+        try:
+            get_rps, get_errors = drive(port, args.clients, args.duration, 'GET', '/')
+            post_rps, post_errors = drive(port, args.clients, args.duration, 'POST', '/add-transaction', body)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+            shutil.rmtree(workdir, ignore_errors=True)
+        print(f"{workers:>7} {get_rps:>12.0f} {get_errors:>7} {post_rps:>28.0f} {post_errors:>7}")
+
+
+if __name__ == '__main__':
+    main()
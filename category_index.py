@@ -0,0 +1,212 @@
+import math
+import threading
+from datetime import date
+
+# In-process index over categorization_patterns so /api/category-suggestions
+# never has to touch SQLite on the keystroke path. When another process
+# writes, refresh() catches up with only the patterns added (id past the last
+# one seen) or bumped (last_used on or after the latest seen) since then;
+# patterns are never deleted, so that is every change.
+
+MIN_WORD_LENGTH = 3
+MAX_SUGGESTIONS = 3
+# Cap on tokens expanded from a trie prefix (a 3-letter prefix on a big ledger can match a lot)
+MAX_PREFIX_TOKENS = 50
+# Days for a pattern's recency weight to halve
+RECENCY_HALF_LIFE_DAYS = 90
+
+
+def tokenize(text):
+    return [word for word in text.lower().split() if len(word) >= MIN_WORD_LENGTH]
+
+
+class _TrieNode:
+    __slots__ = ('children', 'token')
+
+    def __init__(self):
+        self.children = {}
+        self.token = None
+
+
+class CategorySuggestionIndex:
+    """Token inverted index plus a prefix trie over learned description patterns"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.loaded = False
+        # Set when the table may have changed under the index; the next lookup refreshes it
+        self.stale = False
+        self._clear()
+
+    def _clear(self):
+        # (pattern, category_id) -> [usage_count, last_used]
+        self._patterns = {}
+        # pattern text -> set of category ids
+        self._exact = {}
+        # token -> set of (pattern, category_id)
+        self._postings = {}
+        self._trie = _TrieNode()
+        self._category_names = {}
+        # Watermarks of the rows read so far, for refresh()
+        self._max_id = 0
+        self._latest_used = ''
+
+    def load(self, conn):
+        """(Re)build the index from the database"""
+        categories = conn.execute('SELECT id, name FROM categories').fetchall()
+        patterns = conn.execute(
+            'SELECT id, description_pattern, category_id, usage_count, last_used FROM categorization_patterns'
+        ).fetchall()
+        with self._lock:
+            self._clear()
+            self.stale = False
+            for row in categories:
+                self._category_names[row[0]] = row[1]
+            for row in patterns:
+                self._add(row[1], row[2], row[3] or 1, row[4])
+                self._advance(row[0], row[4])
+            self.loaded = True
+
+    def invalidate(self):
+        """Mark the index stale so the next lookup refreshes it (the current data keeps serving until then)"""
+        with self._lock:
+            self.stale = True
+
+    def refresh(self, conn):
+        """Read category names and the patterns written since the last load/refresh"""
+        with self._lock:
+            # Cleared first, so a write landing during the reads marks it stale again
+            self.stale = False
+            max_id, latest_used = self._max_id, self._latest_used
+        categories = conn.execute('SELECT id, name FROM categories').fetchall()
+        patterns = conn.execute('''
+            SELECT id, description_pattern, category_id, usage_count, last_used FROM categorization_patterns
+            WHERE id > ? OR last_used >= ?
+        ''', (max_id, latest_used)).fetchall()
+        with self._lock:
+            self._category_names = {row[0]: row[1] for row in categories}
+            for row in patterns:
+                entry = self._patterns.get((row[1], row[2]))
+                # This process's learn() calls may still be queued, so the row can trail the index
+                usage_count = max(row[3] or 1, entry[0]) if entry else row[3] or 1
+                last_used = max(str(row[4]), str(entry[1])) if entry else row[4]
+                self._add(row[1], row[2], usage_count, last_used)
+                self._advance(row[0], row[4])
+        return len(patterns)
+
+    def _advance(self, row_id, last_used):
+        self._max_id = max(self._max_id, row_id)
+        self._latest_used = max(self._latest_used, str(last_used))
+
+    def _add(self, pattern, category_id, usage_count, last_used):
+        key = (pattern, category_id)
+        entry = self._patterns.get(key)
+        if entry:
+            entry[0] = usage_count
+            entry[1] = last_used
+            return
+        self._patterns[key] = [usage_count, last_used]
+        self._exact.setdefault(pattern, set()).add(category_id)
+        for token in set(tokenize(pattern)):
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                self._insert_token(token)
+            postings.add(key)
+
+    def _insert_token(self, token):
+        node = self._trie
+        for char in token:
+            node = node.children.setdefault(char, _TrieNode())
+        node.token = token
+
+    def _tokens_with_prefix(self, prefix):
+        node = self._trie
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        tokens = []
+        stack = [node]
+        while stack and len(tokens) < MAX_PREFIX_TOKENS:
+            node = stack.pop()
+            if node.token is not None:
+                tokens.append(node.token)
+            stack.extend(node.children.values())
+        return tokens
+
+    def learn(self, pattern, category_id, last_used=None):
+        """Mirror learn_categorization_pattern(): bump usage or add a new pattern"""
+        last_used = str(last_used or date.today())
+        with self._lock:
+            entry = self._patterns.get((pattern, category_id))
+            usage_count = entry[0] + 1 if entry else 1
+            self._add(pattern, category_id, usage_count, last_used)
+
+    def set_category_name(self, category_id, name):
+        with self._lock:
+            self._category_names[category_id] = name
+
+    def remove_category(self, category_id):
+        with self._lock:
+            self._category_names.pop(category_id, None)
+
+    def _weight(self, key, today):
+        usage_count, last_used = self._patterns[key]
+        try:
+            age_days = max((today - date.fromisoformat(str(last_used)[:10])).days, 0)
+        except ValueError:
+            age_days = 0
+        recency = 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+        return math.log1p(usage_count) * (0.5 + recency)
+
+    def suggest(self, description):
+        """Return up to three {'id', 'name', 'confidence'} suggestions"""
+        if not description or len(description.strip()) < 3:
+            return []
+        pattern = description.lower().strip()
+        today = date.today()
+
+        with self._lock:
+            names = self._category_names
+
+            # Exact matches first, same as before: highest usage, then most recent
+            exact = [(pattern, category_id) for category_id in self._exact.get(pattern, ())
+                     if category_id in names]
+            if exact:
+                exact.sort(key=lambda key: (self._patterns[key][0], str(self._patterns[key][1])), reverse=True)
+                return [{'id': key[1], 'name': names[key[1]], 'confidence': 'high'}
+                        for key in exact[:MAX_SUGGESTIONS]]
+
+            words = tokenize(pattern)
+            if not words:
+                return []
+
+            # Whole-word hits count fully; the last word may still be being typed,
+            # so it also matches any learned token it is a prefix of.
+            overlap = {}
+            prefix_hits = {}
+            for word in set(words):
+                for key in self._postings.get(word, ()):
+                    overlap[key] = overlap.get(key, 0) + 1
+            for token in self._tokens_with_prefix(words[-1]):
+                if token == words[-1]:
+                    continue
+                for key in self._postings[token]:
+                    prefix_hits[key] = 1
+
+            scores = {}
+            best_overlap = {}
+            for key in set(overlap) | set(prefix_hits):
+                category_id = key[1]
+                if category_id not in names:
+                    continue
+                matched = overlap.get(key, 0)
+                score = (matched + 0.5 * prefix_hits.get(key, 0)) * self._weight(key, today)
+                scores[category_id] = scores.get(category_id, 0) + score
+                best_overlap[category_id] = max(best_overlap.get(category_id, 0), matched)
+
+            ranked = sorted(scores, key=scores.get, reverse=True)[:MAX_SUGGESTIONS]
+            return [{'id': category_id, 'name': names[category_id],
+                     'confidence': 'medium' if best_overlap[category_id] >= 2 else 'low'}
+                    for category_id in ranked]
@@ -0,0 +1,137 @@
+import queue
+import sqlite3
+import threading
+
+from query_profiler import ProfiledConnection
+
+
+class PooledConnection(ProfiledConnection):
+    """sqlite3 connection that goes back to its pool instead of closing"""
+
+    pool = None
+    request_bound = False
+
+    def close(self):
+        # Request-bound connections are checked back in at teardown, so a
+        # route calling close() mid-request just keeps using the same one.
+        if self.request_bound or self.pool is None:
+            return
+        self.pool.release(self)
+
+    def really_close(self):
+        super().close()
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared by all worker threads"""
+
+    PRAGMAS = (
+        'PRAGMA journal_mode=WAL;',
+        'PRAGMA synchronous=NORMAL;',
+        'PRAGMA cache_size=1000;',
+        'PRAGMA temp_store=memory;',
+    )
+
+    def __init__(self, database, size=8, timeout=30.0, read_only=False, profiler=None):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        # query_only connections for when all writes go through a DatabaseWriter
+        self.read_only = read_only
+        # QueryProfiler that statements on these connections report to (optional)
+        self.profiler = profiler
+        # LIFO so the most recently used (warmest page cache) connection is reused first
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self.stats = {'hits': 0, 'misses': 0, 'waits': 0, 'checkouts': 0, 'timeouts': 0,
+                      'opened': 0, 'closed': 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=self.timeout,
+                               check_same_thread=False, factory=PooledConnection)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        if self.read_only:
+            conn.execute('PRAGMA query_only=ON;')
+        conn.pool = self
+        conn.profiler = self.profiler
+        return conn
+
+    def acquire(self):
+        """Check a connection out of the pool, opening one if below size"""
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self.stats['hits'] += 1
+                self.stats['checkouts'] += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._open < self.size
+            if can_open:
+                self._open += 1
+                self.stats['misses'] += 1
+            else:
+                self.stats['waits'] += 1
+            self.stats['checkouts'] += 1
+
+        if can_open:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._open -= 1
+                raise
+            with self._lock:
+                self.stats['opened'] += 1
+            return conn
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self.stats['timeouts'] += 1
+            raise sqlite3.OperationalError('Timed out waiting for a pooled database connection')
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any uncommitted work"""
+        conn.request_bound = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Connection is unusable; drop it so a fresh one gets opened
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._open -= 1
+            self.stats['closed'] += 1
+        try:
+            conn.really_close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        """Close every idle connection (used on shutdown)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['open'] = self._open
+        stats['idle'] = self._idle.qsize()
+        stats['in_use'] = stats['open'] - stats['idle']
+        stats['size'] = self.size
+        return stats
@@ -0,0 +1,189 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from db_pool import ConnectionPool
+from query_profiler import ProfiledConnection
+
+# Every write in the app goes through one DatabaseWriter: a single connection
+# owned by a background thread, fed by a command queue. Commands that arrive
+# together share one BEGIN IMMEDIATE ... COMMIT (group commit), each inside
+# its own savepoint so a failing command doesn't take its neighbours with it.
+# With one writer there is nothing to contend for the write lock, so routes
+# never see "database is locked"; reads stay on the pool's WAL connections.
+
+MAX_BATCH = 64
+
+
+class DatabaseWriter:
+    """Single writer connection running queued write commands with group commit"""
+
+    def __init__(self, database, max_batch=MAX_BATCH, timeout=30.0, profiler=None):
+        self.database = database
+        # Commands' statements are attributed to the submitting request's profile
+        self.profiler = profiler
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._conn = None
+        self.stats = {'commands': 0, 'failed_commands': 0, 'commits': 0, 'commit_errors': 0,
+                      'max_batch_size': 0, 'total_wait_ms': 0.0, 'total_commit_ms': 0.0,
+                      'connections_opened': 0, 'connections_closed': 0, 'connect_errors': 0, 'timed_out': 0}
+
+    def _connect(self):
+        # isolation_level=None: transactions and savepoints are issued explicitly below
+        conn = sqlite3.connect(self.database, timeout=self.timeout, isolation_level=None,
+                               factory=ProfiledConnection)
+        conn.row_factory = sqlite3.Row
+        conn.profiler = self.profiler
+        for pragma in ConnectionPool.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _enqueue(self, item):
+        # Started on first write, so importing the app (or forking workers) doesn't
+        # spawn it; queued under the lock so a writer failing to connect can't miss it
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+            self._queue.put(item)
+
+    def submit(self, command, *args):
+        """Run command(conn, *args) on the writer and wait for its commit
+
+        Returns the command's result, or raises its exception (or the commit's).
+        Raises TimeoutError after `timeout` seconds without an outcome; a command
+        still waiting in the queue is then cancelled, so it can't commit after the
+        caller has reported a failure (one already running still finishes).
+        Commands must not commit or roll back themselves.
+        """
+        if threading.current_thread() is self._thread:
+            # A command that submits another one just runs it in the same transaction
+            return command(self._conn, *args)
+        future = Future()
+        profile = self.profiler.current() if self.profiler is not None else None
+        self._enqueue((command, args, future, time.monotonic(), profile))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            with self._lock:
+                self.stats['timed_out'] += 1
+            raise
+
+    def _run(self):
+        try:
+            self._conn = self._connect()
+        except Exception as e:
+            # Fail what's queued and let the thread end; the next submit starts a new one and retries
+            with self._lock:
+                self.stats['connect_errors'] += 1
+                self._thread = None
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None and item[2].set_running_or_notify_cancel():
+                        item[2].set_exception(e)
+            return
+        with self._lock:
+            self.stats['connections_opened'] += 1
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._execute(batch)
+        finally:
+            self._conn.close()
+            self._conn = None
+            with self._lock:
+                self.stats['connections_closed'] += 1
+
+    def _execute(self, batch):
+        # Skip commands whose submitter timed out and cancelled them
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        conn = self._conn
+        start = time.monotonic()
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for command, args, future, queued_at, profile in batch:
+                conn.execute('SAVEPOINT command')
+                if self.profiler is not None:
+                    self.profiler.bind(profile)
+                try:
+                    result = command(conn, *args)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO command')
+                    conn.execute('RELEASE command')
+                    outcomes.append((future, None, e))
+                    continue
+                finally:
+                    if self.profiler is not None:
+                        self.profiler.bind(None)
+                conn.execute('RELEASE command')
+                outcomes.append((future, result, None))
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            # The transaction itself failed (BEGIN, a savepoint or COMMIT): nothing in it was written
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                self.stats['commit_errors'] += 1
+                self.stats['failed_commands'] += len(batch)
+            for _, _, future, _, _ in batch:
+                future.set_exception(e)
+            return
+
+        done = time.monotonic()
+        with self._lock:
+            self.stats['commands'] += len(batch)
+            self.stats['commits'] += 1
+            self.stats['failed_commands'] += sum(1 for *_, error in outcomes if error is not None)
+            self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(batch))
+            self.stats['total_wait_ms'] += sum((start - queued_at) * 1000 for _, _, _, queued_at, _ in batch)
+            self.stats['total_commit_ms'] += (done - start) * 1000
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stop(self, timeout=5.0):
+        """Finish the queued commands and close the writer connection (registered with atexit)"""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['depth'] = self._queue.qsize()
+        stats['avg_batch_size'] = round(stats['commands'] / stats['commits'], 2) if stats['commits'] else 0.0
+        stats['avg_wait_ms'] = round(stats['total_wait_ms'] / stats['commands'], 3) if stats['commands'] else 0.0
+        stats['avg_commit_ms'] = round(stats['total_commit_ms'] / stats['commits'], 3) if stats['commits'] else 0.0
+        stats['total_wait_ms'] = round(stats['total_wait_ms'], 3)
+        stats['total_commit_ms'] = round(stats['total_commit_ms'], 3)
+        stats['running'] = self._thread is not None and self._thread.is_alive()
+        return stats
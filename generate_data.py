@@ -0,0 +1,190 @@
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import migrations
+import rollups
+
+# Seeded synthetic data for benchmarks and load tests: a fresh database from
+# the migrations (schema.sql categories and sinking funds) filled with N years
+# of day-to-day spending, subcategories, monthly budgets, sinking fund
+# contributions/withdrawals and learned categorization patterns. Everything
+# derived (monthly rollup, fund balances, FTS index) is made consistent, so
+# `python rollups.py verify` passes on the result. The same seed always
+# produces the same database.
+#
+#   python generate_data.py budget_tracker.db [--years 3] [--per-day 10] [--seed 42]
+
+DEFAULT_YEARS = 3
+DEFAULT_PER_DAY = 10
+CHUNK = 20_000
+
+# category name -> (merchants, (min_cents, max_cents), share of daily transactions, subcategories)
+SPENDING = {
+    'Food': (['Grocery Store', 'Farmers Market', 'Corner Bakery', 'Pizza Place', 'Coffee Shop', 'Sushi Bar'],
+             (300, 15000), 40, ['Groceries', 'Dining Out', 'Coffee']),
+    'Gas': (['Shell Station', 'Chevron', 'Costco Fuel'], (2000, 9000), 10, []),
+    'Car Expenses (Ins. + Maint.)': (['Jiffy Lube', 'State Farm Insurance', 'Car Wash', 'Tire Center'],
+                                     (1500, 60000), 3, ['Insurance', 'Maintenance']),
+    'Utilities & Internet': (['Electric Company', 'Water Utility', 'Fiber Internet', 'Mobile Carrier'],
+                             (3000, 20000), 4, ['Electric', 'Water', 'Internet', 'Phone']),
+    'Online Spending (USD subs + health)': (['Amazon', 'Pharmacy Online', 'App Store', 'eBay'],
+                                            (500, 25000), 12, ['Health', 'Shopping']),
+    'Subscriptions (local & digital)': (['Netflix', 'Spotify', 'Cloud Storage', 'News Subscription'],
+                                        (299, 2499), 6, []),
+    'Prof. Dues + Prime': (['Professional Association', 'Amazon Prime'], (1499, 30000), 1, []),
+    'Credit Card Minimum Payment': (['Credit Card Payment'], (2500, 50000), 2, []),
+    'Car Loan Payment': (['Auto Loan Payment'], (25000, 45000), 1, []),
+}
+
+# Monthly budget per category, in cents
+BUDGETS = {
+    'Food': 90000, 'Gas': 25000, 'Car Expenses (Ins. + Maint.)': 30000, 'Utilities & Internet': 35000,
+    'Online Spending (USD subs + health)': 40000, 'Subscriptions (local & digital)': 8000,
+    'Prof. Dues + Prime': 5000, 'Credit Card Minimum Payment': 20000, 'Car Loan Payment': 38000,
+}
+
+WITHDRAWAL_CHANCE = 0.15
+
+NOTES = ['', '', '', '', 'split with friends', 'reimbursable', 'annual renewal', 'paid in cash']
+
+
+def month_starts(first_day, last_day):
+    month = date(first_day.year, first_day.month, 1)
+    while month <= last_day:
+        yield month
+        month = date(month.year + 1, 1, 1) if month.month == 12 else date(month.year, month.month + 1, 1)
+
+
+def create_database(path):
+    if os.path.exists(path):
+        raise SystemExit(f"{path} already exists; generate into a new file")
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    migrations.migrate(conn, analyze=False)
+    return conn
+
+
+def insert_many(conn, sql, rows):
+    for i in range(0, len(rows), CHUNK):
+        conn.executemany(sql, rows[i:i + CHUNK])
+
+
+def generate(path, years=DEFAULT_YEARS, per_day=DEFAULT_PER_DAY, seed=42, today=None):
+    """Create and fill a database at `path`; returns row counts per table"""
+    rng = random.Random(seed)
+    today = today or date.today()
+    first_day = date(today.year - years, today.month, 1)
+
+    conn = create_database(path)
+    categories = {row[1]: row[0] for row in conn.execute('SELECT id, name FROM categories')}
+    funds = conn.execute('SELECT id, name, monthly_allocation, category_id FROM sinking_funds ORDER BY id').fetchall()
+
+    # Subcategories
+    for name, (_, _, _, subcategories) in SPENDING.items():
+        conn.executemany('INSERT OR IGNORE INTO subcategories (category_id, name) VALUES (?, ?)',
+                         [(categories[name], sub) for sub in subcategories])
+    subcategories = {}
+    for category_id, sub_id in conn.execute('SELECT category_id, id FROM subcategories'):
+        subcategories.setdefault(category_id, []).append(sub_id)
+
+    # Day-to-day spending
+    names = list(SPENDING)
+    weights = [SPENDING[name][2] for name in names]
+    transactions = []
+    day = first_day
+    while day <= today:
+        for name in rng.choices(names, weights, k=max(0, round(rng.gauss(per_day, per_day / 4)))):
+            merchants, (low, high), _, _ = SPENDING[name]
+            category_id = categories[name]
+            subcategory_id = rng.choice(subcategories[category_id]) if category_id in subcategories else None
+            merchant = rng.choice(merchants)
+            # Some descriptions carry a store number, like real statement lines
+            description = merchant if rng.random() < 0.6 else f"{merchant} #{rng.randrange(1, 60)}"
+            transactions.append((day.isoformat(), description, rng.randrange(low, high + 1), category_id,
+                                 subcategory_id, rng.choice(NOTES), None, 'expense'))
+        day += timedelta(days=1)
+
+    # Budget periods, allocations and sinking fund activity, month by month
+    allocations = []
+    transitions = []
+    previous = None
+    for month in month_starts(first_day, today):
+        period_id = conn.execute('INSERT INTO budget_periods (month, year) VALUES (?, ?)',
+                                 (month.month, month.year)).lastrowid
+        for name, amount in BUDGETS.items():
+            # Budgets drift a little month to month
+            allocations.append((period_id, categories[name], int(round(amount * rng.uniform(0.9, 1.1), -2))))
+        if previous:
+            transitions.append((previous.month, previous.year, month.month, month.year, month.isoformat(), 1))
+        previous = month
+
+        for fund_id, fund_name, monthly_allocation, category_id in funds:
+            transactions.append((month.isoformat(), f"Monthly allocation to {fund_name}", monthly_allocation,
+                                 category_id, None, '', fund_id, 'contribution'))
+            if rng.random() < WITHDRAWAL_CHANCE:
+                withdrawal_day = month + timedelta(days=rng.randrange(1, 28))
+                if withdrawal_day <= today:
+                    amount = rng.randrange(monthly_allocation // 4, monthly_allocation + 1)
+                    transactions.append((withdrawal_day.isoformat(), f"{fund_name} expense", amount,
+                                         category_id, None, '', fund_id, 'withdrawal'))
+
+    insert_many(conn, '''
+        INSERT INTO budget_allocations (budget_period_id, category_id, budgeted_amount)
+        VALUES (?, ?, ?)
+    ''', allocations)
+    insert_many(conn, '''
+        INSERT INTO month_transitions (from_month, from_year, to_month, to_year, transition_date, sinking_funds_contributed)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', transitions)
+
+    # Insert in date order, as a ledger filled in over time would be
+    transactions.sort(key=lambda row: row[0])
+    insert_many(conn, '''
+        INSERT INTO transactions (date, description, amount, category_id, subcategory_id, notes,
+                                  sinking_fund_id, transaction_type)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', transactions)
+
+    # Learned patterns, as learn_categorization_pattern() would have recorded them
+    conn.execute('''
+        INSERT INTO categorization_patterns (description_pattern, category_id, usage_count, last_used)
+        SELECT LOWER(TRIM(description)), category_id, COUNT(*), MAX(date)
+        FROM transactions
+        WHERE sinking_fund_id IS NULL
+        GROUP BY LOWER(TRIM(description)), category_id
+    ''')
+
+    rollups.refill(conn)
+    conn.commit()
+    rollups.reconcile_fund_balances(conn)
+    conn.execute('ANALYZE')
+    conn.commit()
+
+    counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+              for table in ('transactions', 'subcategories', 'budget_periods', 'budget_allocations',
+                            'categorization_patterns', 'month_transitions')}
+    conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a seeded synthetic budget tracker database')
+    parser.add_argument('database', help='path of the new database file')
+    parser.add_argument('--years', type=int, default=DEFAULT_YEARS)
+    parser.add_argument('--per-day', type=float, default=DEFAULT_PER_DAY, help='average spending transactions per day')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate(args.database, args.years, args.per_day, args.seed)
+    print(f"Generated {args.database} in {time.perf_counter() - start:.1f}s")
+    for table, count in counts.items():
+        print(f"  {table:<26}{count:>10,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import os
+
+# Production server settings (Procfile: gunicorn --config gunicorn.conf.py app:app)
+#
+#   WEB_CONCURRENCY   worker processes (default 1)
+#   GUNICORN_THREADS  request threads per worker (default 4; keep DB_POOL_SIZE >= this)
+#   PORT              listen port (default 5000)
+#
+# Migrations run once in the master before any worker starts; each worker
+# then only warms its own caches. SQLite is shared safely across processes:
+# WAL lets readers run alongside the one writer, every connection waits out
+# the 30s busy timeout instead of failing, and each worker's db_writer keeps
+# that worker down to one write transaction at a time.
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+# The master imports the app only to run migrations (on its own connection,
+# closed again); pooled connections and the writer threads are opened lazily,
+# so none of them cross fork() into the workers
+preload_app = False
+# Time for a worker to finish in-flight requests and flush its write queues on SIGTERM
+graceful_timeout = 30
+
+
+def on_starting(server):
+    # A failed migration raises here and gunicorn exits before starting any worker
+    import app
+    app.init_db_if_needed()
+
+
+def post_worker_init(worker):
+    import app
+    app.start_worker(shared_database=worker.cfg.workers > 1)
+
+
+def worker_exit(server, worker):
+    import app
+    app.shutdown()
@@ -0,0 +1,317 @@
+import argparse
+import csv
+import json
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+
+import money
+import rollups
+
+# Bank statement import (CSV or OFX). Files are parsed lazily and written in
+# chunked transactions, so memory stays bounded by CHUNK_SIZE, not file size.
+#
+# A single signed amount (OFX TRNAMT, or a CSV amount column without a type
+# column) is read the way banks export it: negative is money out (a debit),
+# positive is money in (a credit). Debits are stored as positive spending;
+# credits, when imported at all, are stored negative so they offset it.
+
+CHUNK_SIZE = 5000
+OFX_READ_SIZE = 64 * 1024
+
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d', '%d-%m-%Y', '%m/%d/%y', '%d %b %Y', '%b %d, %Y')
+
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'posted date', 'posting date', 'value date', 'trans date'),
+    'description': ('description', 'payee', 'name', 'details', 'narrative', 'merchant', 'transaction description'),
+    'amount': ('amount', 'transaction amount', 'value'),
+    'debit': ('debit', 'debit amount', 'withdrawal', 'withdrawals', 'money out', 'paid out'),
+    'credit': ('credit', 'credit amount', 'deposit', 'deposits', 'money in', 'paid in'),
+    'notes': ('memo', 'notes', 'reference'),
+    'type': ('type', 'transaction type', 'dr/cr'),
+}
+
+OFX_CREDIT_TYPES = {'CREDIT', 'DEP', 'INT', 'DIV', 'DIRECTDEP'}
+
+
+class StatementError(ValueError):
+    """Raised for a statement that can't be imported at all (bad header, unknown format)"""
+
+
+def normalize_description(description):
+    return ' '.join((description or '').lower().split())
+
+
+def parse_amount(value):
+    """'$1,234.50', '(12.00)' or '-12' -> integer cents; None for blank"""
+    text = (value or '').strip().replace(' ', '')
+    if not text:
+        return None
+    negative = text.startswith('(') and text.endswith(')')
+    if negative:
+        text = text[1:-1]
+    amount = money.to_cents(text)
+    return -amount if negative else amount
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value, date_format=None):
+    """Statement date -> ISO 'YYYY-MM-DD' (cached: a statement repeats the same few hundred dates)"""
+    text = (value or '').strip()
+    formats = (date_format,) if date_format else DATE_FORMATS
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {text!r}")
+
+
+def parse_csv(stream, date_format=None):
+    """Yield statement rows from a CSV with a header line"""
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if not header:
+        raise StatementError("CSV file is empty")
+
+    names = [column.strip().lower() for column in header]
+    columns = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for index, name in enumerate(names):
+            if name in aliases:
+                columns[field] = index
+                break
+    if 'date' not in columns or 'description' not in columns:
+        raise StatementError(f"CSV needs date and description columns (found: {', '.join(header)})")
+    if 'amount' not in columns and 'debit' not in columns:
+        raise StatementError("CSV needs an amount column or debit/credit columns")
+
+    def cell(record, field):
+        index = columns.get(field)
+        return record[index] if index is not None and index < len(record) else ''
+
+    for line_number, record in enumerate(reader, start=2):
+        if not any(value.strip() for value in record):
+            continue
+        try:
+            is_credit = cell(record, 'type').strip().lower() in ('credit', 'cr')
+            if 'amount' in columns:
+                amount = parse_amount(cell(record, 'amount'))
+                if 'type' not in columns:
+                    is_credit = (amount or 0) > 0
+            else:
+                debit = parse_amount(cell(record, 'debit'))
+                credit = parse_amount(cell(record, 'credit'))
+                amount = debit if debit else credit
+                is_credit = not debit and bool(credit)
+            yield {
+                'date': parse_date(cell(record, 'date'), date_format),
+                'description': cell(record, 'description').strip(),
+                'amount': amount,
+                'notes': cell(record, 'notes').strip(),
+                'is_credit': is_credit,
+            }
+        except (ValueError, TypeError) as e:
+            yield {'error': f"line {line_number}: {e}"}
+
+
+def _ofx_tokens(stream):
+    """Yield (tag, text) pairs from OFX (SGML or XML) without reading the whole file"""
+    buffer = ''
+    while True:
+        chunk = stream.read(OFX_READ_SIZE)
+        buffer += chunk
+        parts = buffer.split('<')
+        # Keep the last (possibly incomplete) piece for the next read
+        buffer = parts.pop() if chunk else ''
+        for part in parts:
+            if '>' not in part:
+                continue
+            tag, _, text = part.partition('>')
+            yield tag.strip().upper(), text.strip()
+        if not chunk:
+            if buffer and '>' in buffer:
+                tag, _, text = buffer.partition('>')
+                yield tag.strip().upper(), text.strip()
+            return
+
+
+def parse_ofx(stream):
+    """Yield statement rows from the STMTTRN records of an OFX file"""
+    record = None
+    for tag, text in _ofx_tokens(stream):
+        if tag == 'STMTTRN':
+            record = {}
+        elif tag == '/STMTTRN' and record is not None:
+            try:
+                amount = parse_amount(record.get('TRNAMT'))
+                posted = re.match(r'\d{8}', record.get('DTPOSTED', ''))
+                if not posted:
+                    raise ValueError(f"bad DTPOSTED {record.get('DTPOSTED')!r}")
+                name = record.get('NAME') or record.get('PAYEE') or record.get('MEMO', '')
+                memo = record.get('MEMO', '') if record.get('MEMO') != name else ''
+                yield {
+                    'date': datetime.strptime(posted.group(), '%Y%m%d').date().isoformat(),
+                    'description': name,
+                    'amount': amount,
+                    'notes': memo,
+                    'is_credit': record.get('TRNTYPE', '').upper() in OFX_CREDIT_TYPES or (amount or 0) > 0,
+                }
+            except (ValueError, TypeError) as e:
+                yield {'error': f"transaction {record.get('FITID', '?')}: {e}"}
+            record = None
+        elif record is not None and not tag.startswith('/'):
+            record[tag] = text
+
+
+def parse_statement(stream, file_format, date_format=None):
+    if file_format == 'csv':
+        return parse_csv(stream, date_format)
+    if file_format == 'ofx':
+        return parse_ofx(stream)
+    raise StatementError(f"Unsupported statement format: {file_format}")
+
+
+def detect_format(filename):
+    return 'ofx' if filename.lower().endswith(('.ofx', '.qfx')) else 'csv'
+
+
+def _existing_keys(conn, rows, max_existing_id):
+    """Multiset of (date, amount, description) already stored for the chunk's (date, amount) pairs"""
+    pairs = sorted({(row['date'], row['amount']) for row in rows})
+    existing = Counter()
+    # id <= max_existing_id ignores rows this import has already written,
+    # so identical lines within one statement are all kept
+    for stored in conn.execute('''
+        SELECT date, amount, description FROM transactions
+        WHERE (date, amount) IN (
+            SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+        ) AND id <= ?
+    ''', (json.dumps(pairs), max_existing_id)):
+        existing[(str(stored[0]), stored[1], normalize_description(stored[2]))] += 1
+    return existing
+
+
+def _write_chunk(conn, rows, max_existing_id, stats):
+    existing = _existing_keys(conn, rows, max_existing_id)
+    to_insert = []
+    for row in rows:
+        key = (row['date'], row['amount'], normalize_description(row['description']))
+        if existing[key] > 0:
+            existing[key] -= 1
+            stats['duplicates'] += 1
+            continue
+        to_insert.append((row['date'], row['description'], row['amount'], row['category_id'], row['notes']))
+
+    if to_insert:
+        conn.executemany('''
+            INSERT INTO transactions (date, description, amount, category_id, notes)
+            VALUES (?, ?, ?, ?, ?)
+        ''', to_insert)
+        rollups.apply_many(conn, [(row[0], row[3], row[2], None, 'expense') for row in to_insert])
+    stats['inserted'] += len(to_insert)
+
+
+def import_statement(conn, rows, categorize, default_category_id=None, include_credits=False,
+                     chunk_size=CHUNK_SIZE, progress=None, submit=None):
+    """Categorize, dedupe and insert parsed statement rows; returns import stats
+
+    categorize(description) returns suggestions like get_category_suggestions();
+    rows with no suggestion go to default_category_id (or are skipped without one).
+    Each chunk is committed on `conn`, or through submit(command) (a
+    DatabaseWriter) when given.
+    """
+    def write(chunk):
+        if submit is not None:
+            submit(_write_chunk, chunk, max_existing_id, stats)
+        else:
+            _write_chunk(conn, chunk, max_existing_id, stats)
+            conn.commit()
+
+    stats = {'read': 0, 'inserted': 0, 'duplicates': 0, 'uncategorized': 0,
+             'skipped_credits': 0, 'invalid': 0, 'errors': []}
+    start = time.perf_counter()
+    max_existing_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM transactions').fetchone()[0]
+
+    chunk = []
+    for row in rows:
+        stats['read'] += 1
+        if 'error' in row or not row['description'] or not row['amount']:
+            stats['invalid'] += 1
+            if 'error' in row and len(stats['errors']) < 20:
+                stats['errors'].append(row['error'])
+            continue
+        if row['is_credit'] and not include_credits:
+            stats['skipped_credits'] += 1
+            continue
+
+        suggestions = categorize(row['description'])
+        if suggestions:
+            row['category_id'] = suggestions[0]['id']
+        elif default_category_id:
+            row['category_id'] = default_category_id
+            stats['uncategorized'] += 1
+        else:
+            stats['uncategorized'] += 1
+            continue
+        row['amount'] = -abs(row['amount']) if row['is_credit'] else abs(row['amount'])
+        chunk.append(row)
+
+        if len(chunk) >= chunk_size:
+            write(chunk)
+            chunk = []
+            if progress:
+                progress(stats, time.perf_counter() - start)
+
+    if chunk:
+        write(chunk)
+
+    elapsed = time.perf_counter() - start
+    stats['elapsed'] = round(elapsed, 3)
+    stats['rows_per_sec'] = round(stats['read'] / elapsed) if elapsed else stats['read']
+    return stats
+
+
+def main():
+    from category_index import CategorySuggestionIndex
+    from db_pool import ConnectionPool
+
+    parser = argparse.ArgumentParser(description='Import a CSV or OFX bank statement into the budget tracker')
+    parser.add_argument('statement')
+    parser.add_argument('--default-category', type=int,
+                        help='category id for rows with no suggestion (otherwise they are skipped)')
+    parser.add_argument('--format', choices=['csv', 'ofx'], help='defaults to the file extension')
+    parser.add_argument('--date-format', help="strptime format for CSV dates, e.g. '%%d/%%m/%%Y'")
+    parser.add_argument('--include-credits', action='store_true', help='also import deposits/refunds')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--database', default='budget_tracker.db')
+    args = parser.parse_args()
+
+    pool = ConnectionPool(args.database, size=1)
+    conn = pool.acquire()
+    if args.default_category and not conn.execute(
+            'SELECT 1 FROM categories WHERE id = ?', (args.default_category,)).fetchone():
+        raise SystemExit(f"Category {args.default_category} does not exist")
+
+    index = CategorySuggestionIndex()
+    index.load(conn)
+
+    def progress(stats, elapsed):
+        print(f"  {stats['read']:,} rows read, {stats['inserted']:,} inserted ({stats['read'] / elapsed:,.0f} rows/sec)")
+
+    file_format = args.format or detect_format(args.statement)
+    with open(args.statement, 'r', encoding='utf-8-sig', errors='replace', newline='') as f:
+        stats = import_statement(conn, parse_statement(f, file_format, args.date_format), index.suggest,
+                                 args.default_category, args.include_credits, args.chunk_size, progress)
+    conn.close()
+    pool.close_all()
+
+    for error in stats.pop('errors'):
+        print(f"  skipped {error}")
+    print(', '.join(f"{key}={value}" for key, value in stats.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import queue
+import threading
+import time
+from datetime import date
+
+# Categorization learning happens after the transaction itself has been
+# committed, so it doesn't need its own fsync on the request path. Routes put
+# (pattern, category_id) events on a bounded in-process queue and one
+# background thread drains it, folding each batch into a single upsert.
+
+FLUSH_INTERVAL_MS = 250
+MAX_QUEUE_SIZE = 10000
+MAX_BATCH_SIZE = 500
+
+UPSERT_PATTERN = '''
+    INSERT INTO categorization_patterns (description_pattern, category_id, usage_count, last_used)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (description_pattern, category_id) DO UPDATE SET
+        usage_count = usage_count + excluded.usage_count,
+        last_used = MAX(last_used, excluded.last_used)
+'''
+
+
+class PatternLearningQueue:
+    """Bounded queue of learned patterns, written in batches by a single background thread"""
+
+    def __init__(self, submit, flush_interval_ms=FLUSH_INTERVAL_MS,
+                 max_size=MAX_QUEUE_SIZE, max_batch=MAX_BATCH_SIZE):
+        # submit(command) runs command(conn) in a committed write (DatabaseWriter.submit)
+        self.submit = submit
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self.stats = {'enqueued': 0, 'written': 0, 'batches': 0, 'errors': 0,
+                      'inline_writes': 0, 'max_depth': 0,
+                      'last_batch_size': 0, 'last_flush_ms': 0.0,
+                      'total_latency_ms': 0.0, 'max_latency_ms': 0.0}
+
+    def _ensure_started(self):
+        # Started on first use rather than at import, so scripts importing the
+        # app (and forked server workers) don't carry an idle thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='pattern-learning', daemon=True)
+                self._thread.start()
+
+    def put(self, pattern, category_id, last_used=None):
+        """Queue one learning event; if the queue is full, write it inline instead of losing it"""
+        event = (pattern, category_id, str(last_used or date.today()), time.monotonic())
+        if self._stopping.is_set():
+            self._write([event])
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.stats['inline_writes'] += 1
+            self._write([event])
+            return
+        with self._lock:
+            self.stats['enqueued'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'], self._queue.qsize())
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._stopping.wait(self.flush_interval)
+            self.flush()
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Write everything queued so far; returns the number of events written"""
+        written = 0
+        batch = self._drain()
+        while batch:
+            self._write(batch)
+            written += len(batch)
+            batch = self._drain()
+        return written
+
+    def _write(self, batch):
+        # Repeats of a pattern within the batch collapse into one row update
+        merged = {}
+        for pattern, category_id, last_used, _ in batch:
+            key = (pattern, category_id)
+            count, latest = merged.get(key, (0, last_used))
+            merged[key] = (count + 1, max(latest, last_used))
+
+        params = [(pattern, category_id, count, last_used)
+                  for (pattern, category_id), (count, last_used) in merged.items()]
+        start = time.monotonic()
+        try:
+            self.submit(lambda conn: conn.executemany(UPSERT_PATTERN, params))
+        except Exception as e:
+            with self._lock:
+                self.stats['errors'] += 1
+            print(f"Error writing categorization patterns: {e}")
+            return
+
+        done = time.monotonic()
+        latencies = [(done - queued_at) * 1000 for *_, queued_at in batch]
+        with self._lock:
+            self.stats['written'] += len(batch)
+            self.stats['batches'] += 1
+            self.stats['last_batch_size'] = len(batch)
+            self.stats['last_flush_ms'] = round((done - start) * 1000, 3)
+            self.stats['total_latency_ms'] += sum(latencies)
+            self.stats['max_latency_ms'] = max(self.stats['max_latency_ms'], max(latencies))
+
+    def stop(self, timeout=5.0):
+        """Stop the writer thread and flush whatever is still queued (registered with atexit)"""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self.flush()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['depth'] = self._queue.qsize()
+        stats['avg_latency_ms'] = round(stats['total_latency_ms'] / stats['written'], 3) if stats['written'] else 0.0
+        stats['total_latency_ms'] = round(stats['total_latency_ms'], 3)
+        stats['max_latency_ms'] = round(stats['max_latency_ms'], 3)
+        stats['running'] = self._thread is not None and self._thread.is_alive()
+        return stats
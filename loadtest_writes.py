@@ -0,0 +1,151 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+# Concurrent write load test. N threads POST /add-transaction through the app
+# (so every write goes through db_writer), then the same load is repeated with
+# one sqlite3 connection per thread committing on its own, the way the routes
+# used to write. Reports lock errors, throughput and latency percentiles; exits
+# non-zero if any request through the app failed.
+#
+#   python loadtest_writes.py [--writers 200] [--requests 20]
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def run_threads(writers, work):
+    """Start `writers` threads running work(i) behind a barrier; returns wall time"""
+    barrier = threading.Barrier(writers + 1)
+
+    def target(i):
+        barrier.wait()
+        work(i)
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def through_app(app_module, writers, requests_per_writer):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    today = date.today().isoformat()
+
+    def work(i):
+        client = app_module.app.test_client()
+        for n in range(requests_per_writer):
+            start = time.perf_counter()
+            response = client.post('/add-transaction', data={
+                'date': today, 'description': f'load test {i}', 'amount': f'{n + 1}.25', 'category_id': '7'
+            })
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code != 302:
+                    errors.append(response.get_data(as_text=True)[:200])
+
+    wall = run_threads(writers, work)
+    return wall, latencies, errors
+
+
+def direct_connections(database, writers, requests_per_writer, busy_timeout):
+    import rollups
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    today = date.today().isoformat()
+
+    def work(i):
+        conn = sqlite3.connect(database, timeout=busy_timeout)
+        for n in range(requests_per_writer):
+            start = time.perf_counter()
+            try:
+                conn.execute(
+                    'INSERT INTO transactions (date, description, amount, category_id) VALUES (?, ?, ?, ?)',
+                    (today, f'direct {i}', (n + 1) * 100 + 25, 7)
+                )
+                rollups.apply_transaction(conn, today, 7, (n + 1) * 100 + 25)
+                conn.commit()
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                with lock:
+                    errors.append(str(e))
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+        conn.close()
+
+    wall = run_threads(writers, work)
+    return wall, latencies, errors
+
+
+def report(label, wall, latencies, errors):
+    locked = sum(1 for error in errors if 'locked' in error)
+    ms = [latency * 1000 for latency in latencies]
+    print(f"{label:<22} {len(latencies):>7} {len(latencies) / wall:>9.0f} {statistics.median(ms):>8.1f} "
+          f"{percentile(ms, 95):>8.1f} {percentile(ms, 99):>8.1f} {max(ms):>9.1f} {len(errors):>7} {locked:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent write load test for the single-writer path')
+    parser.add_argument('--writers', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=20, help='writes per writer thread')
+    parser.add_argument('--busy-timeout', type=float, default=5.0,
+                        help='sqlite3 busy timeout (seconds) for the per-thread connection run')
+    parser.add_argument('--skip-direct', action='store_true', help='only run the load through the app')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='budget-loadtest-')
+    # app.DATABASE is relative, so the app writes into the scratch directory
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    import migrations
+    migrations.SCHEMA_FILE = os.path.join(REPO_DIR, 'schema.sql')
+    import app as app_module
+    app_module.init_db_if_needed()
+    database = os.path.join(workdir, app_module.DATABASE)
+
+    print(f"{args.writers} writers x {args.requests} writes ({database})")
+    print(f"{'':<22} {'writes':>7} {'writes/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>9} "
+          f"{'errors':>7} {'locked':>7}")
+    wall, latencies, errors = through_app(app_module, args.writers, args.requests)
+    report('app (db_writer)', wall, latencies, errors)
+    stats = app_module.db_writer.get_stats()
+
+    if not args.skip_direct:
+        direct = direct_connections(database, args.writers, args.requests, args.busy_timeout)
+        report('connection per thread', *direct)
+
+    print(f"db_writer: {stats['commits']} commits for {stats['commands']} commands "
+          f"(avg batch {stats['avg_batch_size']}, max {stats['max_batch_size']})")
+    for error in errors[:5]:
+        print(f"  app error: {error}")
+    app_module.learning_queue.stop()
+    app_module.db_writer.stop()
+    os.chdir(REPO_DIR)
+    shutil.rmtree(workdir, ignore_errors=True)
+    if errors:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import bisect
+import threading
+import time
+
+# Prometheus text exposition (format 0.0.4) without the client library.
+# RequestMetrics keeps per-route request counts and latency histograms; the
+# request path only does a bisect and a few integer adds under one lock, and
+# all formatting happens at scrape time. family() renders any other numbers
+# (the pool/writer/cache stats dicts) as metric families for /metrics.
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds in seconds; +Inf is implied
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def family(name, kind, help_text, samples):
+    """Lines for one metric family; samples is a number or a list of (labels dict, number)"""
+    if not isinstance(samples, list):
+        samples = [({}, samples)]
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    lines.extend(f'{name}{_labels(labels)} {_number(value)}' for labels, value in samples)
+    return lines
+
+
+class RequestMetrics:
+    """Request counts by route and status, and a latency histogram per route"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, prefix='budget_http'):
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._requests = {}   # (method, route, status) -> count
+        self._latency = {}    # (method, route) -> [count per bucket (last is +Inf)..., sum]
+
+    def observe(self, method, route, status, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        key = (method, route)
+        with self._lock:
+            request_key = (method, route, status)
+            self._requests[request_key] = self._requests.get(request_key, 0) + 1
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += seconds
+
+    def render(self):
+        with self._lock:
+            requests = dict(self._requests)
+            latency = {key: list(histogram) for key, histogram in self._latency.items()}
+
+        lines = family(f'{self.prefix}_requests_total', 'counter', 'HTTP requests by route and status',
+                       [({'method': method, 'route': route, 'status': status}, count)
+                        for (method, route, status), count in sorted(requests.items())])
+
+        name = f'{self.prefix}_request_duration_seconds'
+        lines += [f'# HELP {name} Time from request start to the end of the response body',
+                  f'# TYPE {name} histogram']
+        bounds = self.buckets + (float('inf'),)
+        for (method, route), histogram in sorted(latency.items()):
+            labels = {'method': method, 'route': route}
+            cumulative = 0
+            for bound, count in zip(bounds, histogram):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(dict(labels, le=_number(bound)))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(histogram[-1])}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+
+        lines += family('process_start_time_seconds', 'gauge', 'Start time of the process since the epoch',
+                        self.started)
+        return lines
@@ -0,0 +1,309 @@
+import argparse
+import sqlite3
+import time
+
+import money
+import recurring
+import rollups
+import search as fts
+
+# Versioned schema migrations. Each step runs in its own BEGIN IMMEDIATE
+# transaction together with its schema_version row, so a step is either fully
+# applied and recorded or not applied at all. Steps are written to be
+# idempotent, so a database that ran the old one-off scripts (or an earlier
+# startup check) can replay them safely.
+#
+#   python migrations.py [status|migrate] [--database budget_tracker.db]
+
+SCHEMA_FILE = 'schema.sql'
+
+VERSION_TABLE = '''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        duration_ms INTEGER
+    )
+'''
+
+
+def table_exists(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone() is not None
+
+
+def column_exists(conn, table, column):
+    return any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+
+def run_script(conn, script):
+    """Execute a multi-statement script inside the current transaction
+
+    (executescript() would commit first, splitting the step in two.)
+    """
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ''
+    if statement.strip():
+        conn.execute(statement)
+
+
+def base_schema(conn):
+    """Fresh database: the full current schema from schema.sql"""
+    if table_exists(conn, 'categories'):
+        return
+    with open(SCHEMA_FILE, 'r') as f:
+        run_script(conn, f.read())
+
+
+def month_transitions(conn):
+    """Month rollover tracking (was month_management_migration.py)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS month_transitions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            from_month INTEGER NOT NULL,
+            from_year INTEGER NOT NULL,
+            to_month INTEGER NOT NULL,
+            to_year INTEGER NOT NULL,
+            transition_date DATE NOT NULL,
+            sinking_funds_contributed BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_budget_periods_month_year ON budget_periods(month, year)')
+
+
+def categorization_patterns(conn):
+    """Learned description -> category patterns (was smart_categorization_migration.py)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS categorization_patterns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            description_pattern TEXT NOT NULL,
+            category_id INTEGER NOT NULL,
+            usage_count INTEGER DEFAULT 1,
+            last_used DATE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (category_id) REFERENCES categories (id),
+            UNIQUE(description_pattern, category_id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_categorization_patterns_description ON categorization_patterns(description_pattern)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_categorization_patterns_usage ON categorization_patterns(usage_count DESC)')
+    # Seed from descriptions used at least twice; OR IGNORE keeps counts already learned
+    conn.execute('''
+        INSERT OR IGNORE INTO categorization_patterns (description_pattern, category_id, usage_count, last_used)
+        SELECT LOWER(TRIM(description)), category_id, COUNT(*), MAX(date)
+        FROM transactions
+        WHERE description != '' AND category_id IS NOT NULL
+        GROUP BY LOWER(TRIM(description)), category_id
+        HAVING COUNT(*) >= 2
+    ''')
+
+
+def sinking_funds(conn):
+    """Sinking funds and the transaction columns that link to them (was migrate_sinking_funds.py)"""
+    if not column_exists(conn, 'transactions', 'sinking_fund_id'):
+        conn.execute('ALTER TABLE transactions ADD COLUMN sinking_fund_id INTEGER')
+    if not column_exists(conn, 'transactions', 'transaction_type'):
+        conn.execute("ALTER TABLE transactions ADD COLUMN transaction_type TEXT DEFAULT 'expense'")
+    # Money columns are declared as in the dollars era; convert_to_cents() fixes the values later
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sinking_funds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            target_amount DECIMAL(10,2),
+            current_balance DECIMAL(10,2) DEFAULT 0,
+            monthly_allocation DECIMAL(10,2) DEFAULT 0,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_sinking_fund ON transactions(sinking_fund_id)')
+
+
+def transaction_indexes(conn):
+    """Month range filters, keyset paging and import dedupe; the plain date index is a prefix of these"""
+    # SQLite has no concurrent index builds, but in WAL mode readers keep going
+    # while the step holds the write lock, so only writers wait for the build
+    conn.execute('DROP INDEX IF EXISTS idx_transactions_category_date')
+    conn.execute('DROP INDEX IF EXISTS idx_transactions_date')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date_amount ON transactions(date, amount)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date_created ON transactions(date, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_category_date_created ON transactions(category_id, date, created_at)')
+
+
+def unique_budget_allocations(conn):
+    """One allocation per period/category/subcategory, keeping the row save_budget used to update"""
+    conn.execute('''
+        DELETE FROM budget_allocations WHERE id NOT IN (
+            SELECT MIN(id) FROM budget_allocations
+            GROUP BY budget_period_id, category_id, IFNULL(subcategory_id, 0)
+        )
+    ''')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_budget_allocations_unique
+        ON budget_allocations(budget_period_id, category_id, IFNULL(subcategory_id, 0))
+    ''')
+
+
+def monthly_rollup(conn):
+    """monthly_category_totals, backfilled from the ledger"""
+    if table_exists(conn, 'monthly_category_totals'):
+        return
+    conn.execute(rollups.ROLLUP_SCHEMA)
+    rollups.refill(conn)
+
+
+def transaction_search(conn):
+    """FTS5 index over transaction descriptions and notes (skipped if SQLite lacks FTS5)"""
+    fts.create_fts(conn)
+
+
+def money_in_cents(conn):
+    """Dollar amounts -> integer cents"""
+    money.convert_to_cents(conn)
+
+
+def recurring_transactions(conn):
+    """Recurring transaction rules and the occurrences already written for them"""
+    recurring.create_tables(conn)
+
+
+def sinking_fund_categories(conn):
+    """sinking_funds.category_id, backfilled from the fund -> category map the routes hard-coded"""
+    if not column_exists(conn, 'sinking_funds', 'category_id'):
+        conn.execute('ALTER TABLE sinking_funds ADD COLUMN category_id INTEGER REFERENCES categories (id)')
+    # The routes filed funds 1-5 under these categories and any other fund under
+    # Emergency Fund Build-Up; categories are matched by name, as in schema.sql's seed
+    conn.execute('''
+        UPDATE sinking_funds
+        SET category_id = (
+            SELECT c.id FROM categories c
+            WHERE c.name = CASE sinking_funds.id
+                WHEN 1 THEN 'Wife Support'
+                WHEN 2 THEN 'Car Expenses (Ins. + Maint.)'
+                WHEN 3 THEN 'Emergency Fund Build-Up'
+                WHEN 4 THEN 'Prof. Dues + Prime'
+                WHEN 5 THEN 'Convention & Assembly'
+                ELSE 'Emergency Fund Build-Up'
+            END
+        )
+        WHERE category_id IS NULL
+    ''')
+    # The routes no longer have a fallback, so every fund must come out of this
+    # with a category that exists
+    missing = [row[0] for row in conn.execute('''
+        SELECT sf.name FROM sinking_funds sf
+        LEFT JOIN categories c ON c.id = sf.category_id
+        WHERE c.id IS NULL
+    ''')]
+    if missing:
+        raise sqlite3.IntegrityError(f"No category for sinking funds: {', '.join(missing)}")
+
+def pattern_last_used_index(conn):
+    """Lets the suggestion index fetch just the patterns learned or bumped since it last looked"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_categorization_patterns_last_used ON categorization_patterns(last_used)')
+
+
+# (version, step) in the order they apply; never renumber or reorder, only append
+MIGRATIONS = [
+    (1, base_schema),
+    (2, month_transitions),
+    (3, categorization_patterns),
+    (4, sinking_funds),
+    (5, transaction_indexes),
+    (6, unique_budget_allocations),
+    (7, monthly_rollup),
+    (8, transaction_search),
+    (9, money_in_cents),
+    (10, recurring_transactions),
+    (11, sinking_fund_categories),
+    (12, pattern_last_used_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    if not table_exists(conn, 'schema_version'):
+        return 0
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(conn, analyze=True):
+    """Apply pending migrations, one transaction each; returns the names applied"""
+    if current_version(conn) >= LATEST_VERSION:
+        return []
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute(VERSION_TABLE)
+    conn.commit()
+
+    done = {row[0] for row in conn.execute('SELECT version FROM schema_version')}
+    applied = []
+    for version, step in MIGRATIONS:
+        if version in done:
+            continue
+        start = time.perf_counter()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Re-check under the write lock: another process may have just applied it
+            if conn.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,)).fetchone():
+                conn.rollback()
+                continue
+            step(conn)
+            conn.execute(
+                'INSERT INTO schema_version (version, name, duration_ms) VALUES (?, ?, ?)',
+                (version, step.__name__, round((time.perf_counter() - start) * 1000))
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(step.__name__)
+        print(f"Applied migration {version} ({step.__name__})")
+
+    if applied and analyze:
+        # Fresh statistics for the planner after new indexes/tables; analysis_limit
+        # samples each index so this stays quick on large databases
+        conn.execute('PRAGMA analysis_limit = 1000')
+        conn.execute('ANALYZE')
+        conn.commit()
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply or list budget tracker schema migrations')
+    parser.add_argument('command', nargs='?', choices=['status', 'migrate'], default='migrate')
+    parser.add_argument('--database', default='budget_tracker.db')
+    parser.add_argument('--no-analyze', action='store_true', help='skip ANALYZE after applying migrations')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database, timeout=30.0)
+    conn.execute('PRAGMA journal_mode = WAL')
+
+    if args.command == 'status':
+        applied = {}
+        if table_exists(conn, 'schema_version'):
+            applied = {row[0]: row[1:] for row in conn.execute(
+                'SELECT version, applied_at, duration_ms FROM schema_version')}
+        for version, step in MIGRATIONS:
+            if version in applied:
+                applied_at, duration_ms = applied[version]
+                print(f"{version:>3} {step.__name__:<28} applied {applied_at} ({duration_ms} ms)")
+            else:
+                print(f"{version:>3} {step.__name__:<28} pending")
+    else:
+        applied = migrate(conn, analyze=not args.no_analyze)
+        print(f"{len(applied)} migrations applied; schema is at version {current_version(conn)}")
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
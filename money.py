@@ -0,0 +1,81 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+import rollups
+
+# Money is stored as INTEGER cents in every table (transactions, budget
+# allocations, sinking funds and the monthly rollup), so sums are exact.
+# Dollars only exist at the edges, and this module is the one place that
+# converts: parsing form/statement input, and formatting for templates/JSON.
+
+CENTS = Decimal(100)
+
+# Money columns converted by convert_to_cents()
+MONEY_COLUMNS = {
+    'transactions': ('amount',),
+    'budget_allocations': ('budgeted_amount',),
+    'sinking_funds': ('target_amount', 'current_balance', 'monthly_allocation'),
+}
+
+# PRAGMA user_version from which amounts are stored in cents
+CENTS_SCHEMA_VERSION = 1
+
+
+def to_cents(value):
+    """'1,234.50', '$12', 12.5 or Decimal('3.1') -> integer cents; ValueError if not an amount"""
+    text = str(value).strip().replace('$', '').replace(',', '')
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"Not an amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Not an amount: {value!r}")
+    return int((amount * CENTS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """Cents -> float dollars, for JSON responses and charts"""
+    return round((cents or 0) / 100, 2)
+
+
+def _split(cents):
+    cents = int(round(cents or 0))
+    return ('-' if cents < 0 else ''), abs(cents) // 100, abs(cents) % 100
+
+
+def format_dollars(cents):
+    """Cents -> '1234.50', for form field values and JavaScript literals"""
+    sign, dollars, remainder = _split(cents)
+    return f"{sign}{dollars}.{remainder:02d}"
+
+
+def format_currency(cents):
+    """Cents -> '$1,234.50' (the `currency` template filter)"""
+    sign, dollars, remainder = _split(cents)
+    return f"${sign}{dollars:,}.{remainder:02d}"
+
+
+def _cents_sql(column):
+    # Older rows may hold REAL dollars or text such as '$1,234.50'
+    return f'''CASE
+        WHEN {column} IS NULL THEN NULL
+        WHEN typeof({column}) = 'text'
+            THEN CAST(ROUND(CAST(REPLACE(REPLACE(TRIM({column}), '$', ''), ',', '') AS REAL) * 100) AS INTEGER)
+        ELSE CAST(ROUND({column} * 100) AS INTEGER)
+    END'''
+
+
+def convert_to_cents(conn):
+    """Convert a dollars database to integer cents, inside the caller's transaction
+
+    Returns False if it is already in cents (PRAGMA user_version says so).
+    """
+    if conn.execute('PRAGMA user_version').fetchone()[0] >= CENTS_SCHEMA_VERSION:
+        return False
+    for table, columns in MONEY_COLUMNS.items():
+        assignments = ', '.join(f'{column} = {_cents_sql(column)}' for column in columns)
+        conn.execute(f'UPDATE {table} SET {assignments}')
+    # The rollup is re-derived from the converted ledger rather than scaled
+    conn.execute(rollups.ROLLUP_SCHEMA)
+    rollups.refill(conn)
+    conn.execute(f'PRAGMA user_version = {CENTS_SCHEMA_VERSION}')
+    return True
@@ -0,0 +1,230 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+# Per-request SQL profiling. Connections made with ProfiledConnection (the
+# pool's and the writer's) hand out ProfiledCursors while a request is being
+# profiled; each statement's text, time (execute plus fetching) and row count
+# is recorded against that request. Statements slower than the threshold get
+# their EXPLAIN QUERY PLAN captured and are logged when the request ends, and
+# per-route / per-statement totals are kept for /debug/profile.
+
+SLOW_QUERY_MS = 100
+MAX_STATEMENTS = 500
+
+logger = logging.getLogger('budget_tracker.slow_queries')
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Collapse whitespace so the same statement from different call sites aggregates together"""
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class _Statement:
+    __slots__ = ('sql', 'params', 'ms', 'rows', 'plan')
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        self.ms = 0.0
+        self.rows = 0
+        self.plan = None
+
+
+class RequestProfile:
+    """Statements run on behalf of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = []
+
+    @property
+    def db_ms(self):
+        return sum(statement.ms for statement in self.statements)
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that adds its execute and fetch time and rows to the current request's profile"""
+
+    profiler = None
+    statement = None
+
+    def _track(self, started, rows):
+        statement = self.statement
+        statement.ms += (time.perf_counter() - started) * 1000
+        statement.rows += rows
+        if statement.plan is None and statement.ms >= self.profiler.slow_ms:
+            statement.plan = self.profiler.explain(self.connection, statement.sql, statement.params)
+
+    # Rows for writes come from rowcount (-1 for SELECTs, whose rows are counted as fetched)
+    def execute(self, sql, parameters=()):
+        self.statement = self.profiler.record(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._track(started, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        self.statement = self.profiler.record(sql, None)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._track(started, max(self.rowcount, 0))
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._track(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._track(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._track(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._track(started, 0)
+            raise
+        self._track(started, 1)
+        return row
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3 connection whose execute() is profiled when its profiler has an active request"""
+
+    profiler = None
+
+    def execute(self, sql, parameters=()):
+        profiler = self.profiler
+        if profiler is None or profiler.current() is None:
+            return super().execute(sql, parameters)
+        cursor = self.cursor(ProfiledCursor)
+        cursor.profiler = profiler
+        return cursor.execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        profiler = self.profiler
+        if profiler is None or profiler.current() is None:
+            return super().executemany(sql, seq_of_parameters)
+        cursor = self.cursor(ProfiledCursor)
+        cursor.profiler = profiler
+        return cursor.executemany(sql, seq_of_parameters)
+
+
+class QueryProfiler:
+    """Request-scoped statement recording plus totals per route and per statement since startup"""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, max_statements=MAX_STATEMENTS):
+        self.slow_ms = slow_ms
+        # Cap on distinct statements kept in the totals (ad hoc SQL shouldn't grow it forever)
+        self.max_statements = max_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.routes = {}      # route -> [requests, total_ms, max_ms, queries, db_ms]
+        self.statements = {}  # normalized sql -> [count, total_ms, max_ms, rows, plan]
+
+    def current(self):
+        return getattr(self._local, 'profile', None)
+
+    def bind(self, profile):
+        """Attribute statements on this thread to `profile` (None to stop); returns the previous one"""
+        previous = self.current()
+        self._local.profile = profile
+        return previous
+
+    def start(self):
+        profile = RequestProfile()
+        self._local.profile = profile
+        return profile
+
+    def record(self, sql, params):
+        statement = _Statement(sql, params)
+        profile = self.current()
+        if profile is not None:
+            profile.statements.append(statement)
+        return statement
+
+    def explain(self, conn, sql, params):
+        try:
+            rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, params or ()).fetchall()
+        except sqlite3.Error as e:
+            return f"(no plan: {e})"
+        return '; '.join(row[3] for row in rows)
+
+    def server_timing(self, profile):
+        """Server-Timing header value for the statements run so far"""
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        return (f'db;dur={profile.db_ms:.2f};desc="{len(profile.statements)} queries", '
+                f'app;dur={total_ms:.2f}')
+
+    def finish(self, route):
+        """End the current request's profile: log its slow statements and add it to the totals"""
+        profile = self.current()
+        self._local.profile = None
+        if profile is None:
+            return None
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        db_ms = profile.db_ms
+
+        for statement in profile.statements:
+            if statement.ms >= self.slow_ms:
+                logger.warning("Slow query (%.1f ms, %d rows) in %s: %s | plan: %s",
+                               statement.ms, statement.rows, route, normalize(statement.sql), statement.plan)
+
+        with self._lock:
+            totals = self.routes.setdefault(route, [0, 0.0, 0.0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += total_ms
+            totals[2] = max(totals[2], total_ms)
+            totals[3] += len(profile.statements)
+            totals[4] += db_ms
+            for statement in profile.statements:
+                key = normalize(statement.sql)
+                totals = self.statements.get(key)
+                if totals is None:
+                    if len(self.statements) >= self.max_statements:
+                        continue
+                    totals = self.statements[key] = [0, 0.0, 0.0, 0, None]
+                totals[0] += 1
+                totals[1] += statement.ms
+                totals[2] = max(totals[2], statement.ms)
+                totals[3] += statement.rows
+                if statement.plan:
+                    totals[4] = statement.plan
+        return profile
+
+    def slowest_routes(self, limit=20):
+        with self._lock:
+            rows = [{'route': route, 'requests': count, 'avg_ms': total / count, 'max_ms': max_ms,
+                     'avg_queries': queries / count, 'avg_db_ms': db_ms / count}
+                    for route, (count, total, max_ms, queries, db_ms) in self.routes.items()]
+        return sorted(rows, key=lambda row: row['avg_ms'], reverse=True)[:limit]
+
+    def slowest_statements(self, limit=20):
+        with self._lock:
+            rows = [{'sql': sql, 'count': count, 'avg_ms': total / count, 'max_ms': max_ms,
+                     'total_ms': total, 'avg_rows': rows / count, 'plan': plan}
+                    for sql, (count, total, max_ms, rows, plan) in self.statements.items()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self.routes.clear()
+            self.statements.clear()
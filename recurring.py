@@ -0,0 +1,174 @@
+import argparse
+import calendar
+import sqlite3
+from datetime import date, timedelta
+
+import rollups
+
+# Recurring transactions: each rule in recurring_transactions (amount,
+# category, frequency, next_due) turns into real transactions once its dates
+# come due. materialize_due() writes every due occurrence of every rule in the
+# caller's transaction with a handful of set-based statements, however many
+# periods were missed while the app was down. recurring_occurrences has one
+# row per (rule, occurrence date), so an occurrence is written at most once
+# even if two processes catch up at the same time or next_due is moved back.
+#
+#   python recurring.py run [--database budget_tracker.db] [--today 2024-05-01]
+
+FREQUENCIES = ('weekly', 'monthly', 'yearly')
+
+# Occurrences written per rule per run, so a rule with a far-past start date
+# (or a misconfigured one) can't flood the ledger in one go; the rest follow
+# on the next runs
+MAX_CATCH_UP = 1000
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS recurring_transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        description TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        category_id INTEGER NOT NULL,
+        subcategory_id INTEGER NULL,
+        sinking_fund_id INTEGER NULL,
+        transaction_type TEXT DEFAULT 'expense',
+        frequency TEXT NOT NULL DEFAULT 'monthly' CHECK (frequency IN ('weekly', 'monthly', 'yearly')),
+        interval_count INTEGER NOT NULL DEFAULT 1 CHECK (interval_count > 0),
+        start_date DATE NOT NULL,
+        next_due DATE NOT NULL,
+        end_date DATE NULL,
+        is_active BOOLEAN DEFAULT TRUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (category_id) REFERENCES categories (id),
+        FOREIGN KEY (subcategory_id) REFERENCES subcategories (id),
+        FOREIGN KEY (sinking_fund_id) REFERENCES sinking_funds (id)
+    );
+    CREATE TABLE IF NOT EXISTS recurring_occurrences (
+        recurring_id INTEGER NOT NULL,
+        occurrence_date DATE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (recurring_id, occurrence_date),
+        FOREIGN KEY (recurring_id) REFERENCES recurring_transactions (id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_recurring_transactions_due ON recurring_transactions(is_active, next_due);
+'''
+
+
+def advance(day, frequency, interval_count=1, anchor_day=None):
+    """The occurrence after `day`; monthly/yearly keep to anchor_day, clamped to short months"""
+    if frequency == 'weekly':
+        return day + timedelta(weeks=interval_count)
+    months = interval_count * (12 if frequency == 'yearly' else 1)
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    month += 1
+    anchor_day = anchor_day or day.day
+    return date(year, month, min(anchor_day, calendar.monthrange(year, month)[1]))
+
+
+def due_dates(rule, through, limit=MAX_CATCH_UP):
+    """Occurrence dates of `rule` from its next_due up to `through`, and the next_due after them"""
+    start = date.fromisoformat(str(rule['start_date']))
+    end = date.fromisoformat(str(rule['end_date'])) if rule['end_date'] else None
+    # Never before the start date, even if next_due was edited back past it
+    day = max(date.fromisoformat(str(rule['next_due'])), start)
+    dates = []
+    while day <= through and (end is None or day <= end) and len(dates) < limit:
+        dates.append(day)
+        # Anchored on the start date so Jan 31 -> Feb 28 -> Mar 31, not Mar 28
+        day = advance(day, rule['frequency'], rule['interval_count'], start.day)
+    return dates, day
+
+
+def materialize_due(conn, today=None):
+    """Write every due occurrence of every active rule; returns the new transactions
+
+    Runs on the caller's connection and transaction (the app submits it to
+    the writer). Returned rows are (date, category_id, amount,
+    sinking_fund_id, transaction_type), as rollups.apply_many() takes them.
+    """
+    today = today or date.today()
+    rules = conn.execute('''
+        SELECT * FROM recurring_transactions
+        WHERE is_active = 1 AND next_due <= ?
+    ''', (today.isoformat(),)).fetchall()
+    if not rules:
+        return []
+
+    candidates = []
+    next_due = []
+    for rule in rules:
+        dates, following = due_dates(rule, today)
+        candidates.extend((rule['id'], day.isoformat()) for day in dates)
+        next_due.append((following.isoformat(), rule['id']))
+
+    # Claim the occurrences; the ones already recorded are skipped here and below
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS recurring_batch (recurring_id INTEGER, occurrence_date DATE)')
+    conn.execute('DELETE FROM temp.recurring_batch')
+    conn.executemany('INSERT INTO temp.recurring_batch (recurring_id, occurrence_date) VALUES (?, ?)', candidates)
+    conn.execute('''
+        DELETE FROM temp.recurring_batch
+        WHERE (recurring_id, occurrence_date) IN (SELECT recurring_id, occurrence_date FROM recurring_occurrences)
+    ''')
+    conn.execute('''
+        INSERT INTO recurring_occurrences (recurring_id, occurrence_date)
+        SELECT recurring_id, occurrence_date FROM temp.recurring_batch
+    ''')
+    conn.execute('''
+        INSERT INTO transactions (date, description, amount, category_id, subcategory_id,
+                                  sinking_fund_id, transaction_type, notes)
+        SELECT b.occurrence_date, r.description, r.amount, r.category_id, r.subcategory_id,
+               r.sinking_fund_id, COALESCE(r.transaction_type, 'expense'), 'recurring'
+        FROM temp.recurring_batch b
+        JOIN recurring_transactions r ON r.id = b.recurring_id
+        ORDER BY b.occurrence_date, b.recurring_id
+    ''')
+    created = conn.execute('''
+        SELECT b.occurrence_date, r.category_id, r.amount, r.sinking_fund_id,
+               COALESCE(r.transaction_type, 'expense')
+        FROM temp.recurring_batch b
+        JOIN recurring_transactions r ON r.id = b.recurring_id
+    ''').fetchall()
+    conn.execute('DELETE FROM temp.recurring_batch')
+    conn.executemany('UPDATE recurring_transactions SET next_due = ? WHERE id = ?', next_due)
+
+    created = [tuple(row) for row in created]
+    rollups.apply_many(conn, created)
+    fund_deltas = {}
+    for _, _, amount, sinking_fund_id, transaction_type in created:
+        if sinking_fund_id is not None:
+            key = (sinking_fund_id, transaction_type)
+            fund_deltas[key] = fund_deltas.get(key, 0) + amount
+    for (sinking_fund_id, transaction_type), amount in fund_deltas.items():
+        rollups.apply_fund_transaction(conn, sinking_fund_id, transaction_type, amount)
+    return created
+
+
+def create_tables(conn):
+    for statement in SCHEMA.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write due recurring transactions')
+    parser.add_argument('command', choices=['run'])
+    parser.add_argument('--database', default='budget_tracker.db')
+    parser.add_argument('--today', type=date.fromisoformat, help='materialize as of this date')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database, timeout=30.0, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        created = materialize_due(conn, args.today)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    print(f"Wrote {len(created)} recurring transactions")
+
+
+if __name__ == '__main__':
+    main()
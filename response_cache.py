@@ -0,0 +1,115 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import Response, current_app, request
+
+# In-process read-through cache for rendered pages/JSON. Entries expire after
+# a TTL, the least recently used ones are evicted past max_entries, and the
+# write routes drop entries by tag as soon as the underlying data changes.
+
+
+class _Entry:
+    __slots__ = ('body', 'mimetype', 'etag', 'last_modified', 'expires', 'tags')
+
+    def __init__(self, body, mimetype, tags, ttl):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        self.expires = time.monotonic() + ttl
+        self.tags = tags
+
+
+class ResponseCache:
+    """TTL + LRU cache of response bodies with tag-based invalidation"""
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so a response computed across a write isn't stored
+        self._generation = 0
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, key, body, mimetype, tags, generation=None):
+        entry = _Entry(body, mimetype, frozenset(tags), self.ttl)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return entry
+
+    def invalidate(self, *tags):
+        """Drop every entry built from any of the given data tags"""
+        tags = set(tags)
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, entry in self._entries.items() if entry.tags & tags]
+            for key in stale:
+                del self._entries[key]
+            self.stats['invalidations'] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['ttl'] = self.ttl
+        return stats
+
+    def _respond(self, entry):
+        response = Response(entry.body, mimetype=entry.mimetype)
+        response.set_etag(entry.etag)
+        response.last_modified = entry.last_modified
+        # Browsers keep the copy but revalidate, so unchanged data costs a 304
+        response.headers['Cache-Control'] = 'no-cache'
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            with self._lock:
+                self.stats['not_modified'] += 1
+        return response
+
+    def cached_view(self, *tags):
+        """Decorator for GET views whose output depends only on the URL, the month and tagged data"""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                key = (request.path, tuple(sorted(request.args.items(multi=True))),
+                       datetime.now().strftime('%Y-%m'))
+                entry = self.get(key)
+                if entry is None:
+                    generation = self._generation
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    entry = self.set(key, response.get_data(), response.mimetype, tags, generation)
+                return self._respond(entry)
+            return wrapper
+        return decorator
@@ -0,0 +1,251 @@
+import argparse
+import sqlite3
+
+# Ledger-derived totals kept in step with the transactions table by the write
+# routes, so read paths never re-aggregate raw rows:
+#   - monthly_category_totals: spend/contributions/withdrawals per month and category
+#   - sinking_funds.current_balance: contributions minus withdrawals per fund
+# All amounts are integer cents, so the incremental totals stay exact.
+
+ROLLUP_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS monthly_category_totals (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        category_id INTEGER NOT NULL,
+        spent INTEGER NOT NULL DEFAULT 0,
+        expense_count INTEGER NOT NULL DEFAULT 0,
+        contributions INTEGER NOT NULL DEFAULT 0,
+        withdrawals INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (year, month, category_id),
+        FOREIGN KEY (category_id) REFERENCES categories (id)
+    )
+'''
+
+# Same grouping the rollup represents, computed from scratch
+AGGREGATE_QUERY = '''
+    SELECT
+        CAST(strftime('%Y', date) AS INTEGER) AS year,
+        CAST(strftime('%m', date) AS INTEGER) AS month,
+        category_id,
+        COALESCE(SUM(CASE WHEN sinking_fund_id IS NULL THEN amount ELSE 0 END), 0) AS spent,
+        SUM(CASE WHEN sinking_fund_id IS NULL THEN 1 ELSE 0 END) AS expense_count,
+        COALESCE(SUM(CASE WHEN transaction_type = 'contribution' THEN amount ELSE 0 END), 0) AS contributions,
+        COALESCE(SUM(CASE WHEN transaction_type = 'withdrawal' THEN amount ELSE 0 END), 0) AS withdrawals
+    FROM transactions
+    GROUP BY year, month, category_id
+'''
+
+FUND_BALANCE_QUERY = '''
+    SELECT
+        sf.id,
+        sf.name,
+        sf.current_balance,
+        COALESCE(SUM(CASE WHEN t.transaction_type = 'contribution' THEN t.amount ELSE 0 END), 0) -
+        COALESCE(SUM(CASE WHEN t.transaction_type = 'withdrawal' THEN t.amount ELSE 0 END), 0) AS ledger_balance
+    FROM sinking_funds sf
+    LEFT JOIN transactions t ON sf.id = t.sinking_fund_id
+    GROUP BY sf.id, sf.name, sf.current_balance
+'''
+
+def _year_month(value):
+    """Split a 'YYYY-MM-DD' string (or date) into (year, month)"""
+    text = str(value)
+    return int(text[:4]), int(text[5:7])
+
+
+def apply_transaction(conn, txn_date, category_id, amount, sinking_fund_id=None,
+                      transaction_type='expense', sign=1):
+    """Add (sign=1) or remove (sign=-1) one transaction from the rollup
+
+    Must be called on the same connection and before the commit of the write
+    it mirrors, so both land in one transaction.
+    """
+    year, month = _year_month(txn_date)
+    amount = int(amount) * sign
+    is_expense = sinking_fund_id is None
+    conn.execute('''
+        INSERT INTO monthly_category_totals
+            (year, month, category_id, spent, expense_count, contributions, withdrawals)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (year, month, category_id) DO UPDATE SET
+            spent = spent + excluded.spent,
+            expense_count = expense_count + excluded.expense_count,
+            contributions = contributions + excluded.contributions,
+            withdrawals = withdrawals + excluded.withdrawals
+    ''', (
+        year, month, int(category_id),
+        amount if is_expense else 0,
+        sign if is_expense else 0,
+        amount if transaction_type == 'contribution' else 0,
+        amount if transaction_type == 'withdrawal' else 0,
+    ))
+
+
+def apply_transaction_row(conn, row, sign=1):
+    """apply_transaction() for a transactions row (sqlite3.Row or dict)"""
+    apply_transaction(conn, row['date'], row['category_id'], row['amount'],
+                      row['sinking_fund_id'], row['transaction_type'], sign)
+
+
+def apply_many(conn, rows):
+    """Add many new transactions to the rollup with one upsert per (month, category)
+
+    rows are (date, category_id, amount, sinking_fund_id, transaction_type) tuples.
+    """
+    deltas = {}
+    for txn_date, category_id, amount, sinking_fund_id, transaction_type in rows:
+        year, month = _year_month(txn_date)
+        delta = deltas.setdefault((year, month, int(category_id)), [0, 0, 0, 0])
+        amount = int(amount)
+        if sinking_fund_id is None:
+            delta[0] += amount
+            delta[1] += 1
+        if transaction_type == 'contribution':
+            delta[2] += amount
+        elif transaction_type == 'withdrawal':
+            delta[3] += amount
+    conn.executemany('''
+        INSERT INTO monthly_category_totals
+            (year, month, category_id, spent, expense_count, contributions, withdrawals)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (year, month, category_id) DO UPDATE SET
+            spent = spent + excluded.spent,
+            expense_count = expense_count + excluded.expense_count,
+            contributions = contributions + excluded.contributions,
+            withdrawals = withdrawals + excluded.withdrawals
+    ''', [(*key, *delta) for key, delta in deltas.items()])
+
+
+def apply_fund_transaction(conn, sinking_fund_id, transaction_type, amount, sign=1):
+    """Move a fund's current_balance for one contribution/withdrawal (sign=-1 to undo it)"""
+    if sinking_fund_id is None:
+        return
+    if transaction_type == 'contribution':
+        delta = int(amount) * sign
+    elif transaction_type == 'withdrawal':
+        delta = -int(amount) * sign
+    else:
+        return
+    conn.execute(
+        'UPDATE sinking_funds SET current_balance = COALESCE(current_balance, 0) + ? WHERE id = ?',
+        (delta, sinking_fund_id)
+    )
+
+
+def apply_monthly_contributions(conn, txn_date):
+    """Rollup and balances for one monthly_allocation contribution to every active fund
+
+    Set-based counterpart of the per-transaction functions for the monthly
+    contribution run: one upsert per category and one balance update, however
+    many funds there are.
+    """
+    year, month = _year_month(txn_date)
+    conn.execute('''
+        INSERT INTO monthly_category_totals
+            (year, month, category_id, spent, expense_count, contributions, withdrawals)
+        SELECT ?, ?, category_id, 0, 0, SUM(monthly_allocation), 0
+        FROM sinking_funds
+        WHERE is_active = 1 AND monthly_allocation > 0
+        GROUP BY category_id
+        ON CONFLICT (year, month, category_id) DO UPDATE SET
+            contributions = contributions + excluded.contributions
+    ''', (year, month))
+    conn.execute('''
+        UPDATE sinking_funds SET current_balance = COALESCE(current_balance, 0) + monthly_allocation
+        WHERE is_active = 1 AND monthly_allocation > 0
+    ''')
+
+
+def fund_balance_drift(conn):
+    """Return [(fund_id, name, stored, ledger)] for funds whose balance disagrees with the ledger"""
+    return [
+        (row[0], row[1], row[2], row[3])
+        for row in conn.execute(FUND_BALANCE_QUERY)
+        if (row[2] or 0) != (row[3] or 0)
+    ]
+
+
+def reconcile_fund_balances(conn):
+    """Reset drifted fund balances to the ledger total; returns the drift that was repaired"""
+    drift = fund_balance_drift(conn)
+    conn.executemany(
+        'UPDATE sinking_funds SET current_balance = ? WHERE id = ?',
+        [(ledger, fund_id) for fund_id, _, _, ledger in drift]
+    )
+    conn.commit()
+    return drift
+
+
+def refill(conn):
+    """Recompute the whole rollup from transactions without committing"""
+    conn.execute('DELETE FROM monthly_category_totals')
+    conn.execute(f'''
+        INSERT INTO monthly_category_totals
+            (year, month, category_id, spent, expense_count, contributions, withdrawals)
+        {AGGREGATE_QUERY}
+    ''')
+
+
+def rebuild(conn):
+    """Recompute the whole rollup from transactions"""
+    refill(conn)
+    conn.commit()
+
+
+def verify(conn):
+    """Return a list of (year, month, category_id, column, stored, actual) mismatches"""
+    stored = {
+        (row[0], row[1], row[2]): row[3:]
+        for row in conn.execute('''
+            SELECT year, month, category_id, spent, expense_count, contributions, withdrawals
+            FROM monthly_category_totals
+        ''')
+    }
+    actual = {(row[0], row[1], row[2]): row[3:] for row in conn.execute(AGGREGATE_QUERY)}
+
+    columns = ('spent', 'expense_count', 'contributions', 'withdrawals')
+    zero = (0, 0, 0, 0)
+    mismatches = []
+    for key in sorted(set(stored) | set(actual)):
+        for column, stored_value, actual_value in zip(columns, stored.get(key, zero), actual.get(key, zero)):
+            if (stored_value or 0) != (actual_value or 0):
+                mismatches.append((*key, column, stored_value, actual_value))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Rebuild or verify the monthly_category_totals rollup, or reconcile sinking fund balances'
+    )
+    parser.add_argument('command', choices=['rebuild', 'verify', 'reconcile-funds'])
+    parser.add_argument('--dry-run', action='store_true', help='reconcile-funds: report drift without repairing it')
+    parser.add_argument('--database', default='budget_tracker.db')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database, timeout=30.0)
+    conn.execute(ROLLUP_SCHEMA)
+
+    if args.command == 'reconcile-funds':
+        drift = fund_balance_drift(conn) if args.dry_run else reconcile_fund_balances(conn)
+        for fund_id, name, stored, ledger in drift:
+            print(f"Fund {fund_id} ({name}): stored={stored} ledger={ledger}")
+        action = 'found' if args.dry_run else 'repaired'
+        print(f"{len(drift)} drifted balances {action}")
+    elif args.command == 'rebuild':
+        rebuild(conn)
+        count = conn.execute('SELECT COUNT(*) FROM monthly_category_totals').fetchone()[0]
+        print(f"Rebuilt monthly_category_totals ({count} rows)")
+    else:
+        mismatches = verify(conn)
+        for year, month, category_id, column, stored_value, actual_value in mismatches:
+            print(f"{year}-{month:02d} category {category_id}: {column} stored={stored_value} actual={actual_value}")
+        print(f"{len(mismatches)} mismatches found")
+        if mismatches:
+            conn.close()
+            raise SystemExit(1)
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
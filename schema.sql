@@ -1,4 +1,5 @@
 -- Budget Tracker Database Schema
+-- Money columns hold integer cents (see money.py)
 
 -- Main categories
 CREATE TABLE IF NOT EXISTS categories (
@@ -32,7 +33,7 @@ CREATE TABLE IF NOT EXISTS budget_allocations (
     budget_period_id INTEGER NOT NULL,
     category_id INTEGER NOT NULL,
     subcategory_id INTEGER NULL,
-    budgeted_amount DECIMAL(10,2) NOT NULL,
+    budgeted_amount INTEGER NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (budget_period_id) REFERENCES budget_periods (id),
     FOREIGN KEY (category_id) REFERENCES categories (id),
@@ -43,11 +44,13 @@ CREATE TABLE IF NOT EXISTS budget_allocations (
 CREATE TABLE IF NOT EXISTS sinking_funds (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT UNIQUE NOT NULL,
-    target_amount DECIMAL(10,2),
-    current_balance DECIMAL(10,2) DEFAULT 0,
-    monthly_allocation DECIMAL(10,2) DEFAULT 0,
+    target_amount INTEGER,
+    current_balance INTEGER DEFAULT 0,
+    monthly_allocation INTEGER DEFAULT 0,
     is_active BOOLEAN DEFAULT TRUE,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Category the fund's contributions and withdrawals are filed under
+    category_id INTEGER NOT NULL REFERENCES categories (id)
 );
 
 -- Month transitions
@@ -79,7 +82,7 @@ CREATE TABLE IF NOT EXISTS transactions (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     date DATE NOT NULL,
     description TEXT NOT NULL,
-    amount DECIMAL(10,2) NOT NULL,
+    amount INTEGER NOT NULL,
     category_id INTEGER NOT NULL,
     subcategory_id INTEGER NULL,
     sinking_fund_id INTEGER NULL,
@@ -92,14 +95,63 @@ CREATE TABLE IF NOT EXISTS transactions (
     FOREIGN KEY (sinking_fund_id) REFERENCES sinking_funds (id)
 );
 
+-- Monthly spend rollup (maintained by the write routes, see rollups.py)
+CREATE TABLE IF NOT EXISTS monthly_category_totals (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    category_id INTEGER NOT NULL,
+    spent INTEGER NOT NULL DEFAULT 0,
+    expense_count INTEGER NOT NULL DEFAULT 0,
+    contributions INTEGER NOT NULL DEFAULT 0,
+    withdrawals INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (year, month, category_id),
+    FOREIGN KEY (category_id) REFERENCES categories (id)
+);
+
+-- Recurring transaction rules (amounts in cents); materialized by recurring.py
+CREATE TABLE IF NOT EXISTS recurring_transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    description TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    category_id INTEGER NOT NULL,
+    subcategory_id INTEGER NULL,
+    sinking_fund_id INTEGER NULL,
+    transaction_type TEXT DEFAULT 'expense',
+    frequency TEXT NOT NULL DEFAULT 'monthly' CHECK (frequency IN ('weekly', 'monthly', 'yearly')),
+    interval_count INTEGER NOT NULL DEFAULT 1 CHECK (interval_count > 0),
+    start_date DATE NOT NULL,
+    next_due DATE NOT NULL,
+    end_date DATE NULL,
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (category_id) REFERENCES categories (id),
+    FOREIGN KEY (subcategory_id) REFERENCES subcategories (id),
+    FOREIGN KEY (sinking_fund_id) REFERENCES sinking_funds (id)
+);
+
+-- One row per occurrence written, so none is written twice
+CREATE TABLE IF NOT EXISTS recurring_occurrences (
+    recurring_id INTEGER NOT NULL,
+    occurrence_date DATE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (recurring_id, occurrence_date),
+    FOREIGN KEY (recurring_id) REFERENCES recurring_transactions (id)
+) WITHOUT ROWID;
+
 -- Indexes
-CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date);
+CREATE INDEX IF NOT EXISTS idx_transactions_date_amount ON transactions(date, amount);
 CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions(category_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_date_created ON transactions(date, created_at);
+CREATE INDEX IF NOT EXISTS idx_transactions_category_date_created ON transactions(category_id, date, created_at);
 CREATE INDEX IF NOT EXISTS idx_transactions_sinking_fund ON transactions(sinking_fund_id);
 CREATE INDEX IF NOT EXISTS idx_budget_period ON budget_allocations(budget_period_id);
+-- One allocation per period/category/subcategory; IFNULL because NULL subcategories never collide in a plain UNIQUE
+CREATE UNIQUE INDEX IF NOT EXISTS idx_budget_allocations_unique ON budget_allocations(budget_period_id, category_id, IFNULL(subcategory_id, 0));
 CREATE INDEX IF NOT EXISTS idx_budget_periods_month_year ON budget_periods(month, year);
 CREATE INDEX IF NOT EXISTS idx_categorization_patterns_description ON categorization_patterns(description_pattern);
 CREATE INDEX IF NOT EXISTS idx_categorization_patterns_usage ON categorization_patterns(usage_count DESC);
+CREATE INDEX IF NOT EXISTS idx_categorization_patterns_last_used ON categorization_patterns(last_used);
+CREATE INDEX IF NOT EXISTS idx_recurring_transactions_due ON recurring_transactions(is_active, next_due);
 
 -- Insert default categories
 INSERT OR IGNORE INTO categories (name) VALUES 
@@ -117,9 +169,16 @@ INSERT OR IGNORE INTO categories (name) VALUES
 ('Subscriptions (local & digital)');
 
 -- Insert default sinking funds
-INSERT OR IGNORE INTO sinking_funds (name, target_amount, monthly_allocation) VALUES 
-('Wife/Household', 50000, 20000),
-('Vehicle', 100000, 24500),
-('Emergency Fund', 200000, 1947),
-('Discretionary', 75000, 15000),
-('Assembly/Convention', 30000, 9167);
+INSERT OR IGNORE INTO sinking_funds (name, target_amount, monthly_allocation, category_id)
+SELECT fund.name, fund.target_amount, fund.monthly_allocation, c.id
+FROM (
+    SELECT 'Wife/Household' AS name, 5000000 AS target_amount, 2000000 AS monthly_allocation, 'Wife Support' AS category
+    UNION ALL SELECT 'Vehicle', 10000000, 2450000, 'Car Expenses (Ins. + Maint.)'
+    UNION ALL SELECT 'Emergency Fund', 20000000, 194700, 'Emergency Fund Build-Up'
+    UNION ALL SELECT 'Discretionary', 7500000, 1500000, 'Prof. Dues + Prime'
+    UNION ALL SELECT 'Assembly/Convention', 3000000, 916700, 'Convention & Assembly'
+) AS fund
+JOIN categories c ON c.name = fund.category;
+
+-- Amounts above are already in cents; tells money.convert_to_cents() there's nothing to convert
+PRAGMA user_version = 1;
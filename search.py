@@ -0,0 +1,88 @@
+import sqlite3
+
+from markupsafe import Markup, escape
+
+# Full-text search over transaction descriptions and notes (SQLite FTS5).
+# The index is an external-content table kept in sync by triggers, so every
+# write path (routes, scripts, imports) updates it without extra code.
+
+# Separate statements (not one script) so they can run inside a caller's transaction
+FTS_SCHEMA = (
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+        description, notes,
+        content='transactions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts (rowid, description, notes)
+        VALUES (new.id, new.description, new.notes);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, description, notes)
+        VALUES ('delete', old.id, old.description, old.notes);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE OF description, notes ON transactions BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, description, notes)
+        VALUES ('delete', old.id, old.description, old.notes);
+        INSERT INTO transactions_fts (rowid, description, notes)
+        VALUES (new.id, new.description, new.notes);
+    END''',
+)
+
+# Control characters can't come from a form field, so they're safe snippet markers
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+SNIPPET_TOKENS = 12
+
+
+def fts_table_exists(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='transactions_fts'"
+    ).fetchone() is not None
+
+
+def create_fts(conn):
+    """Create and fill the FTS index and triggers if missing, without committing; False if SQLite lacks FTS5"""
+    if fts_table_exists(conn):
+        return True
+    try:
+        conn.execute(FTS_SCHEMA[0])
+    except sqlite3.OperationalError as e:
+        if 'fts5' not in str(e):
+            raise
+        print("SQLite was built without FTS5; transaction search will use LIKE")
+        return False
+    for statement in FTS_SCHEMA[1:]:
+        conn.execute(statement)
+    conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+    return True
+
+
+def ensure_fts(conn):
+    """create_fts() and commit"""
+    created = create_fts(conn)
+    conn.commit()
+    return created
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    terms = []
+    for word in text.split():
+        word = word.replace('"', '""')
+        terms.append(f'"{word}"*')
+    return ' '.join(terms) or None
+
+
+def snippet_column():
+    """SELECT expression for a highlighted snippet (use with a transactions_fts join)"""
+    return (f"snippet(transactions_fts, -1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', "
+            f"'…', {SNIPPET_TOKENS})")
+
+
+def highlight(snippet):
+    """Escape a snippet and turn the match markers into <mark> tags"""
+    if not snippet:
+        return ''
+    html = str(escape(snippet))
+    return Markup(html.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import threading
+import time
+
+from query_profiler import ProfiledConnection
+
+# Read-only snapshot of the database for heavy analytics reads, kept current
+# with the SQLite online backup API. Routes reading from it never share a
+# page cache or a WAL read transaction with the request path or the writer;
+# in exchange the data can be up to max_age seconds old. A background thread
+# re-copies the database every refresh_interval seconds, but only if
+# PRAGMA data_version says something was committed since the last copy, and
+# a reader that finds the snapshot older than max_age refreshes it first.
+#
+# The copy lives in memory, or in a file (written to a temporary name and
+# renamed into place, so the file on disk is always a complete snapshot).
+# Each refresh builds a new connection and swaps it in; requests still
+# reading the previous one finish on it and it is closed once they let go.
+
+
+class SnapshotConnection(ProfiledConnection):
+    """Connection to a snapshot, shared by all readers; close() leaves it open for the others"""
+
+    def close(self):
+        pass
+
+    def really_close(self):
+        super().close()
+
+
+class DatabaseSnapshot:
+    """Read-only copy of a database, re-copied with the backup API when it goes stale"""
+
+    def __init__(self, database, max_age=60.0, path=None, refresh_interval=None, profiler=None, on_refresh=None):
+        self.database = database
+        # Oldest the snapshot may be when a reader gets it, in seconds
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval or max_age / 2
+        # None keeps the snapshot in memory
+        self.path = path
+        self.profiler = profiler
+        # Called after a refresh that copied new data (e.g. to drop caches built from the old one)
+        self.on_refresh = on_refresh
+        self._conn = None
+        self._source = None
+        self._data_version = None
+        self._verified_at = None
+        self._copied_at = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'refreshes': 0, 'unchanged': 0, 'reader_refreshes': 0, 'errors': 0,
+                      'total_refresh_ms': 0.0, 'last_refresh_ms': 0.0}
+
+    def age(self):
+        """Seconds since the snapshot was last known to match the database (None before the first copy)"""
+        verified_at = self._verified_at
+        return None if verified_at is None else time.monotonic() - verified_at
+
+    def connection(self):
+        """The current snapshot's connection, refreshed first if it is older than max_age"""
+        age = self.age()
+        if age is None or age > self.max_age:
+            with self._refresh_lock:
+                # Another reader may have refreshed it while this one waited
+                age = self.age()
+                if age is None or age > self.max_age:
+                    self.stats['reader_refreshes'] += 1
+                    self._refresh()
+        return self._conn
+
+    def refresh(self):
+        """Copy the database now if it changed since the last copy; returns whether it copied"""
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self):
+        started = time.monotonic()
+        if self._source is None:
+            self._source = sqlite3.connect(self.database, timeout=30.0, check_same_thread=False)
+        version = self._source.execute('PRAGMA data_version').fetchone()[0]
+        if self._conn is not None and version == self._data_version:
+            self._verified_at = started
+            self.stats['unchanged'] += 1
+            return False
+
+        if self.path is None:
+            target = ':memory:'
+        else:
+            # Per-process name, so several workers refreshing the same path don't collide
+            target = f'{self.path}.{os.getpid()}.tmp'
+            if os.path.exists(target):
+                os.remove(target)
+        conn = sqlite3.connect(target, check_same_thread=False, factory=SnapshotConnection)
+        try:
+            self._source.backup(conn)
+            if self.path is not None:
+                # The copy comes out in WAL mode; a renamed file must not depend on -wal/-shm siblings
+                conn.execute('PRAGMA journal_mode=DELETE')
+                os.replace(target, self.path)
+        except Exception:
+            conn.really_close()
+            raise
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA query_only=ON')
+        conn.profiler = self.profiler
+
+        # The previous connection is closed when the last request using it drops it
+        self._conn = conn
+        self._data_version = version
+        self._verified_at = self._copied_at = started
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.stats['refreshes'] += 1
+        self.stats['last_refresh_ms'] = round(elapsed_ms, 3)
+        self.stats['total_refresh_ms'] += elapsed_ms
+        if self.on_refresh is not None:
+            self.on_refresh()
+        return True
+
+    def start(self):
+        """Take the first snapshot and keep refreshing it on a daemon thread"""
+        self.refresh()
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='db-snapshot', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except (sqlite3.Error, OSError) as e:
+                self.stats['errors'] += 1
+                print(f"Could not refresh the analytics snapshot: {e}")
+
+    def stop(self, timeout=5.0):
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._stop.set()
+            thread.join(timeout)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        age = self.age()
+        stats['age_seconds'] = None if age is None else round(age, 3)
+        copied_at = self._copied_at
+        stats['copy_age_seconds'] = None if copied_at is None else round(time.monotonic() - copied_at, 3)
+        stats['max_age'] = self.max_age
+        stats['refresh_interval'] = self.refresh_interval
+        stats['mode'] = 'memory' if self.path is None else 'file'
+        stats['total_refresh_ms'] = round(stats['total_refresh_ms'], 3)
+        stats['running'] = self._thread is not None and self._thread.is_alive()
+        return stats
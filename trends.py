@@ -0,0 +1,142 @@
+import threading
+from datetime import date
+
+import money
+
+# Multi-month spend vs budget per category, read from the monthly rollup and
+# budget allocations. Closed months are cached in memory (their rows only
+# change when a back-dated write comes in, which calls invalidate()), so a
+# trend request usually queries just the current month. Everything is summed
+# in cents and converted to dollars only in the returned columns.
+
+DEFAULT_MONTHS = 24
+MAX_MONTHS = 120
+DEFAULT_WINDOW = 3
+
+TREND_QUERY = '''
+    SELECT year, month, category_id, SUM(spent) AS spent, SUM(budgeted) AS budgeted
+    FROM (
+        SELECT year, month, category_id, spent, 0 AS budgeted
+        FROM monthly_category_totals
+        WHERE (year, month) >= (?, ?) AND (year, month) <= (?, ?) AND expense_count > 0
+        UNION ALL
+        SELECT bp.year, bp.month, ba.category_id, 0, ba.budgeted_amount
+        FROM budget_allocations ba
+        JOIN budget_periods bp ON bp.id = ba.budget_period_id
+        WHERE (bp.year, bp.month) >= (?, ?) AND (bp.year, bp.month) <= (?, ?)
+    )
+    GROUP BY year, month, category_id
+'''
+
+
+def month_range(end_year, end_month, count):
+    """The `count` (year, month) pairs ending at end_year/end_month, oldest first"""
+    index = end_year * 12 + end_month - 1
+    return [(i // 12, i % 12 + 1) for i in range(index - count + 1, index + 1)]
+
+
+def rolling_mean(values, window):
+    """Trailing mean over up to `window` values, one running sum for the whole series"""
+    result = []
+    total = 0
+    for i, value in enumerate(values):
+        total += value
+        if i >= window:
+            total -= values[i - window]
+        result.append(total / min(i + 1, window))
+    return result
+
+
+def deltas(values):
+    """Month-over-month change; None for the first month"""
+    return [None] + [b - a for a, b in zip(values, values[1:])]
+
+
+def dollars(values):
+    return [None if value is None else money.from_cents(value) for value in values]
+
+
+class TrendEngine:
+    """Per-category monthly trends with an in-memory cache of closed months"""
+
+    def __init__(self):
+        self._closed = {}  # (year, month) -> {category_id: (spent, budgeted)}
+        self._lock = threading.Lock()
+        # Bumped by invalidate() so a month read across a write isn't cached
+        self._generation = 0
+
+    def invalidate(self, txn_date=None):
+        """Forget one month (by any date in it), or every month when no date is given"""
+        with self._lock:
+            self._generation += 1
+            if txn_date is None:
+                self._closed.clear()
+            else:
+                text = str(txn_date)
+                self._closed.pop((int(text[:4]), int(text[5:7])), None)
+
+    def _load(self, conn, keys, current):
+        """Month -> {category_id: (spent, budgeted)} for `keys`, querying only what isn't cached"""
+        with self._lock:
+            data = {key: self._closed[key] for key in keys if key in self._closed}
+            generation = self._generation
+        missing = [key for key in keys if key not in data]
+        if not missing:
+            return data
+
+        # One grouped query from the oldest missing month through the newest
+        first, last = missing[0], missing[-1]
+        fetched = {key: {} for key in missing}
+        for row in conn.execute(TREND_QUERY, (*first, *last, *first, *last)):
+            key = (row['year'], row['month'])
+            if key in fetched:
+                fetched[key][row['category_id']] = (row['spent'] or 0, row['budgeted'] or 0)
+        data.update(fetched)
+
+        with self._lock:
+            for key, values in fetched.items():
+                if key < current and generation == self._generation:
+                    self._closed[key] = values
+        return data
+
+    def build(self, conn, months=DEFAULT_MONTHS, window=DEFAULT_WINDOW, today=None):
+        """Columnar trends for the last `months` months ending with the current one"""
+        today = today or date.today()
+        current = (today.year, today.month)
+        keys = month_range(today.year, today.month, months)
+        data = self._load(conn, keys, current)
+
+        names = {row['id']: row['name'] for row in conn.execute('SELECT id, name FROM categories')}
+        category_ids = sorted({cid for values in data.values() for cid in values if cid in names},
+                              key=lambda cid: names[cid])
+
+        categories = []
+        total_spent = [0] * len(keys)
+        total_budgeted = [0] * len(keys)
+        for category_id in category_ids:
+            spent = [data[key].get(category_id, (0, 0))[0] for key in keys]
+            budgeted = [data[key].get(category_id, (0, 0))[1] for key in keys]
+            total_spent = [a + b for a, b in zip(total_spent, spent)]
+            total_budgeted = [a + b for a, b in zip(total_budgeted, budgeted)]
+            categories.append({
+                'id': category_id,
+                'name': names[category_id],
+                'spent': dollars(spent),
+                'budgeted': dollars(budgeted),
+                'variance': dollars([b - s for s, b in zip(spent, budgeted)]),
+                'rolling_avg': dollars(rolling_mean(spent, window)),
+                'mom_delta': dollars(deltas(spent)),
+            })
+
+        return {
+            'months': [f"{year}-{month:02d}" for year, month in keys],
+            'window': window,
+            'categories': categories,
+            'totals': {
+                'spent': dollars(total_spent),
+                'budgeted': dollars(total_budgeted),
+                'variance': dollars([b - s for s, b in zip(total_spent, total_budgeted)]),
+                'rolling_avg': dollars(rolling_mean(total_spent, window)),
+                'mom_delta': dollars(deltas(total_spent)),
+            },
+        }